@@ -13,29 +13,102 @@ Key Features:
 """
 
 import numpy as np
-import pandas as pd
-import joblib
 import logging
+import multiprocessing
+import os
 import time
-from typing import Dict, List, Any, Optional, Tuple
-from scipy.sparse import csr_matrix
-from scipy.spatial.distance import cosine
-from sklearn.decomposition import TruncatedSVD, NMF
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.neural_network import MLPRegressor
-from sklearn.ensemble import RandomForestRegressor
-from collections import defaultdict, Counter
-import json
-import hashlib
+from typing import Dict, Iterable, List, Any, Optional, Tuple
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
 import warnings
+from common_kernels import NUMBA_AVAILABLE, cosine_similarities, top_k_dot_scores
 warnings.filterwarnings('ignore')
 
+try:
+    from threadpoolctl import threadpool_limits
+    THREADPOOLCTL_AVAILABLE = True
+except ImportError:
+    THREADPOOLCTL_AVAILABLE = False
+
 # Setup logging for the module
 logging.basicConfig(level=logging.INFO)
 module_logger = logging.getLogger(__name__)
 
+# Field order of the (item, score, reason, confidence) rows held by the prediction cache
+PREDICTION_FIELDS = ('item', 'score', 'reason', 'confidence')
+
+# Action text per recommendation source; the only argument besides the category is
+# the score for 'xgboost' and the confidence percentage for 'neural'
+ACTION_TEMPLATES = {
+    'xgboost': "Recommended by our AI model - %s with %.1f/5.0 predicted rating",
+    'user_based': "Users with similar taste loved this %s - try it because others like you rated it highly",
+    'item_based': "Since you liked similar %s items, this one is perfect for your taste",
+    'matrix_factorization': "Our advanced analytics found this %s matches your preferences perfectly",
+    'content': "Based on %s features you love - same style, great quality",
+    'neural': "AI deep learning suggests this %s - %.0f%% confidence match",
+    'collaborative_high': "Highly recommended %s - loved by your recommendation community",
+    'collaborative': "Good match %s based on user behavior patterns",
+    'exceptional': "Exceptional %s - top recommendation just for you!",
+    'great': "Great %s choice - perfectly matched to your interests",
+    'good': "Good %s option - likely to interest you",
+    'high_confidence': "High-confidence %s recommendation tailored for you",
+    'default': "Consider this %s - it might be a pleasant surprise",
+}
+
+def _action_code(reason: str, score: float, confidence: float) -> str:
+    """Pick the ACTION_TEMPLATES key for a lower-cased reason, falling back on score and confidence"""
+    if 'xgboost' in reason:
+        return 'xgboost'
+    if 'similar users' in reason or 'user-based' in reason:
+        return 'user_based'
+    if 'similar items' in reason or 'item-based' in reason:
+        return 'item_based'
+    if 'matrix factorization' in reason or 'pattern analysis' in reason:
+        return 'matrix_factorization'
+    if 'content' in reason or 'similarity' in reason:
+        return 'content'
+    if 'neural' in reason:
+        return 'neural'
+    if 'collaborative' in reason:
+        return 'collaborative_high' if score > 4.0 else 'collaborative'
+    if score > 4.5:
+        return 'exceptional'
+    if score > 4.0:
+        return 'great'
+    if score > 3.5:
+        return 'good'
+    if confidence > 0.8:
+        return 'high_confidence'
+    return 'default'
+
+def _top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores, highest first (ties keep index order).
+    np.partition finds the cutoff in O(N), so only the k winners are sorted."""
+    k = min(k, scores.size)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    kth = -np.partition(-scores, k - 1)[k - 1]  # k-th largest score
+    above = np.flatnonzero(scores > kth)
+    ties = np.flatnonzero(scores == kth)[:k - above.size]
+    idx = np.concatenate((above, ties))
+    return idx[np.lexsort((idx, -scores[idx]))]
+
+# Engine handed to predict_many() workers; they inherit it through fork instead of pickling it
+_worker_engine = None
+
+def _init_predict_worker():
+    """Pin BLAS/OpenMP to one thread per worker so parallel processes don't oversubscribe cores"""
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[var] = '1'
+    # The BLAS pools were already started in the parent, so the env vars alone are not enough
+    if THREADPOOLCTL_AVAILABLE:
+        threadpool_limits(1)
+
+def _predict_in_worker(user_id: Any, n_items: int) -> List[Dict]:
+    return _worker_engine.predict(user_id, n_items)
+
 class AdvancedRecommendationEngine:
     """
     Advanced hybrid recommendation engine that maintains full backward compatibility
@@ -60,11 +133,14 @@ class AdvancedRecommendationEngine:
             handler.setFormatter(formatter)
             self.logger.addHandler(handler)
             self.logger.setLevel(logging.INFO)
+            # Records are written by this handler; propagating would print each one again via root
+            self.logger.propagate = False
         
         # Load existing XGBoost model for backward compatibility
         self.xgboost_model = None
         if model_path:
             try:
+                import joblib
                 self.xgboost_model = joblib.load(model_path)
                 self.logger.info(f"Loaded existing XGBoost model from {model_path}")
             except Exception as e:
@@ -80,6 +156,7 @@ class AdvancedRecommendationEngine:
         
         # Collaborative Filtering Data Structures
         self.user_item_matrix = None
+        self.user_item_csr = None  # CSR copy of user_item_matrix for the sparse products
         self.item_user_matrix = None
         self.user_similarity_matrix = None
         self.item_similarity_matrix = None
@@ -90,6 +167,8 @@ class AdvancedRecommendationEngine:
         
         # User-Item interaction data
         self.interaction_data = defaultdict(dict)  # {user_id: {item_id: rating}}
+        self._interaction_stats = None  # memoized (users, interactions) for get_model_info()
+        self._popularity_ranking = None  # memoized user-independent popularity list for cold-start
         self.user_profiles = {}  # {user_id: user_features}
         self.item_profiles = {}  # {item_id: item_features}
         
@@ -168,11 +247,8 @@ class AdvancedRecommendationEngine:
         self.user_embeddings = {}  # {user_id: embedding_vector}
         self.neural_scaler = None  # For neural network input scaling
         
-        # Cache for recommendations with LRU-style eviction
-        self.recommendation_cache = {}
-        self.cache_access_times = {}
-        self.cache_hits = 0
-        self.cache_misses = 0
+        # LRU cache for predict() results (functools.lru_cache, sized by config['cache_size'])
+        self._reset_prediction_cache()
         self.performance_logs = []
         
         # Initialize hybrid components
@@ -241,6 +317,10 @@ class AdvancedRecommendationEngine:
     def _init_collaborative_filtering(self):
         """Initialize collaborative filtering components."""
         try:
+            # sklearn/scipy are imported here rather than at module level, so importing this
+            # module stays cheap and a missing dependency only disables this component
+            from sklearn.decomposition import TruncatedSVD, NMF
+            
             # Initialize SVD and NMF models for matrix factorization
             self.svd_model = TruncatedSVD(
                 n_components=min(50, self.config.get('svd_components', 50)),
@@ -267,6 +347,9 @@ class AdvancedRecommendationEngine:
     def _init_content_based_filtering(self):
         """Initialize content-based filtering components."""
         try:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            from sklearn.preprocessing import StandardScaler
+            
             # Initialize TF-IDF vectorizer for text features
             self.tfidf_vectorizer = TfidfVectorizer(
                 max_features=self.config.get('tfidf_max_features', 1000),
@@ -298,6 +381,9 @@ class AdvancedRecommendationEngine:
     def _init_neural_network(self):
         """Initialize neural network components."""
         try:
+            from sklearn.neural_network import MLPRegressor
+            from sklearn.preprocessing import StandardScaler
+            
             # Initialize MLPRegressor for user preference learning
             self.neural_model = MLPRegressor(
                 hidden_layer_sizes=self.config.get('neural_hidden_layers', (64, 32, 16)),
@@ -342,25 +428,10 @@ class AdvancedRecommendationEngine:
         start_time = time.time()
         
         try:
-            # Enhanced context-aware caching
-            cache_key = self._get_contextual_cache_key(user_id, n_items, context)
-            cached_result = self._get_from_cache(cache_key)
-            
-            if cached_result is not None:
-                self._log_performance('predict', time.time() - start_time, True, len(cached_result))
-                return cached_result
-            
-            # Generate domain-specific context-aware hybrid recommendations
-            recommendations = self._generate_wellness_recommendations(user_id, n_items, context, domain)
-            
-            # Ensure backward compatibility format
-            formatted_recs = self._format_predictions(recommendations)
-            
-            # Cache the result
-            self._add_to_cache(cache_key, formatted_recs)
+            rows = self._predict_rows(user_id, n_items, context, domain, start_time)
             
-            self._log_performance('predict', time.time() - start_time, False, len(formatted_recs))
-            return formatted_recs
+            # Fresh dicts on every call, so callers can never mutate a cached entry
+            return [dict(zip(PREDICTION_FIELDS, row)) for row in rows]
             
         except Exception as e:
             self.logger.error(f"Error in predict(): {e}")
@@ -369,6 +440,125 @@ class AdvancedRecommendationEngine:
             self._log_performance('predict', time.time() - start_time, False, len(fallback_recs), error=True)
             return fallback_recs
     
+    def predict_columnar(self, user_id: Any, n_items: int = 10, context: Optional[Dict] = None, domain: Optional[str] = None) -> Dict[str, List]:
+        """
+        Generate the same predictions as predict(), as parallel lists instead of one dict per item.
+        
+        Args:
+            user_id: User identifier
+            n_items: Number of items to recommend (default: 10)
+            
+        Returns:
+            Dictionary with 'items', 'scores', 'reasons' and 'confidences' lists
+        """
+        import time
+        start_time = time.time()
+        
+        try:
+            rows = self._predict_rows(user_id, n_items, context, domain, start_time)
+            
+        except Exception as e:
+            self.logger.error(f"Error in predict_columnar(): {e}")
+            fallback_recs = self._format_predictions(self._emergency_fallback_recommendations(user_id, n_items))
+            self._log_performance('predict', time.time() - start_time, False, len(fallback_recs), error=True)
+            rows = [tuple(rec[field] for field in PREDICTION_FIELDS) for rec in fallback_recs]
+        
+        items, scores, reasons, confidences = (list(column) for column in zip(*rows)) if rows else ([], [], [], [])
+        return {
+            'items': items,
+            'scores': scores,
+            'reasons': reasons,
+            'confidences': confidences
+        }
+    
+    def _predict_rows(self, user_id: Any, n_items: int, context: Optional[Dict], domain: Optional[str], start_time: float) -> Tuple[Tuple, ...]:
+        """Look up (or compute and cache) the prediction rows behind predict() and predict_columnar()."""
+        # Context-aware caching keyed on the full (frozen) context and domain
+        frozen_context = self._freeze_context(context)
+        cache_key = (user_id, n_items, frozen_context, domain)
+        try:
+            hash(cache_key)
+        except TypeError:  # unhashable user_id or context values: compute without caching
+            rows = self._predict_uncached(*cache_key)
+            cache_hit = False
+        else:
+            hits = self._predict_cached.cache_info().hits
+            rows = self._predict_cached(*cache_key)
+            cache_hit = self._predict_cached.cache_info().hits > hits
+        
+        self._log_performance('predict', time.time() - start_time, cache_hit, len(rows))
+        return rows
+    
+    def _predict_uncached(self, user_id: Any, n_items: int, frozen_context: Optional[Tuple], domain: Optional[str]) -> Tuple[Tuple, ...]:
+        """Compute predict() rows as immutable (item, score, reason, confidence) tuples for the LRU cache."""
+        context = dict(frozen_context) if frozen_context is not None else None
+        
+        # Generate domain-specific context-aware hybrid recommendations
+        recommendations = self._generate_wellness_recommendations(user_id, n_items, context, domain)
+        
+        # Ensure backward compatibility format
+        return tuple(tuple(rec[field] for field in PREDICTION_FIELDS)
+                     for rec in self._format_predictions(recommendations))
+    
+    def predict_batch(self, user_ids: List[Any], n_items: int = 10, context: Optional[Dict] = None, domain: Optional[str] = None) -> List[List[Dict]]:
+        """
+        Generate predictions for several users in one call.
+        
+        Args:
+            user_ids: User identifiers
+            n_items: Number of items to recommend per user (default: 10)
+        
+        Returns:
+            One predict() result per user, in the order of user_ids
+        """
+        return [self.predict(user_id, n_items, context, domain) for user_id in user_ids]
+    
+    def predict_domains(self, user_id: Any, domain_contexts: List[Tuple[str, Optional[Dict]]], n_items: int = 10) -> List[List[Dict]]:
+        """
+        Generate domain-specific predictions for one user across several wellness domains.
+        
+        Args:
+            user_id: User identifier
+            domain_contexts: (domain, context) pairs
+            n_items: Number of items to recommend per domain (default: 10)
+        
+        Returns:
+            One predict() result per pair, in the order of domain_contexts
+        """
+        return [self.predict(user_id, n_items, context, domain) for domain, context in domain_contexts]
+    
+    def predict_many(self, user_ids: List[Any], n_items: int = 10, workers: Optional[int] = None) -> List[List[Dict]]:
+        """
+        Generate predictions for many users across worker processes.
+        
+        Only pays off when each predict() call is expensive (several ms); forking the pool
+        costs more than a batch of cached or rule-based predictions. Workers fork from this
+        engine, so their cache entries and performance logs are not merged back. Falls back
+        to predict_batch() for a single worker, a single user, or platforms without fork.
+        
+        Args:
+            user_ids: User identifiers
+            n_items: Number of items to recommend per user (default: 10)
+            workers: Worker processes (default: os.cpu_count())
+            
+        Returns:
+            One predict() result per user, in the order of user_ids
+        """
+        global _worker_engine
+        if workers == 1 or len(user_ids) < 2 or 'fork' not in multiprocessing.get_all_start_methods():
+            return self.predict_batch(user_ids, n_items)
+        
+        _worker_engine = self
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'),
+                                     initializer=_init_predict_worker) as executor:
+                return list(executor.map(_predict_in_worker, user_ids, repeat(n_items)))
+        except Exception as e:
+            self.logger.error(f"Error in predict_many(): {e}")
+            return self.predict_batch(user_ids, n_items)
+        finally:
+            _worker_engine = None
+    
     def recommend(self, user_data: Optional[Dict] = None) -> Dict[str, Any]:
         """
         Generate recommendations - EXACT same interface as existing engine.
@@ -434,20 +624,13 @@ class AdvancedRecommendationEngine:
             # Ensure parameters are within valid bounds
             n_items = max(1, min(n_items, self.config.get('max_recommendations', 50)))
             
-            # Use predict method (which handles caching, fallback, error handling)
-            recommendations = self.predict(user_id, n_items)
-            
-            # Format in exact same format as existing engine - NEVER crash
-            if recommendations:
-                items = [rec.get('item', f'item_{i}') for i, rec in enumerate(recommendations)]
-                scores = [rec.get('score', 0.0) for rec in recommendations]
-            else:
-                items = []
-                scores = []
+            # Columnar predict (same caching, fallback and error handling as predict()),
+            # so no per-item dicts are built just to be taken apart again
+            columns = self.predict_columnar(user_id, n_items)
             
             return {
-                'items': items,
-                'scores': scores
+                'items': columns['items'],
+                'scores': columns['scores']
             }
             
         except Exception as e:
@@ -482,28 +665,28 @@ class AdvancedRecommendationEngine:
                     xgboost_recs = self._xgboost_recommendations(user_id, n_items)
                     all_recommendations.extend(xgboost_recs)
                 except Exception as e:
-                    self.logger.debug(f"XGBoost failed for {user_id}: {e}")
+                    self.logger.debug("XGBoost failed for %s: %s", user_id, e)
             
             # 2. Collaborative filtering recommendations 
             try:
                 collaborative_recs = self._collaborative_filtering_recommendations(user_id, n_items)
                 all_recommendations.extend(collaborative_recs)
             except Exception as e:
-                self.logger.debug(f"Collaborative filtering failed for {user_id}: {e}")
+                self.logger.debug("Collaborative filtering failed for %s: %s", user_id, e)
             
             # 3. Content-based filtering recommendations
             try:
                 content_recs = self._content_based_recommendations(user_id, n_items)
                 all_recommendations.extend(content_recs)
             except Exception as e:
-                self.logger.debug(f"Content-based filtering failed for {user_id}: {e}")
+                self.logger.debug("Content-based filtering failed for %s: %s", user_id, e)
             
             # 4. Neural network recommendations
             try:
                 neural_recs = self._neural_network_recommendations(user_id, n_items)
                 all_recommendations.extend(neural_recs)
             except Exception as e:
-                self.logger.debug(f"Neural network failed for {user_id}: {e}")
+                self.logger.debug("Neural network failed for %s: %s", user_id, e)
             
             # 5. Combine and deduplicate recommendations using ensemble weights
             if all_recommendations:
@@ -574,6 +757,19 @@ class AdvancedRecommendationEngine:
     
     def _popularity_based_recommendations(self, user_id: Any, n_items: int) -> List[Dict]:
         """Generate recommendations based on item popularity."""
+        try:
+            # Popularity does not depend on the user, so the full ranking is built once and
+            # sliced for every cold-start call until add_user_interaction() invalidates it
+            if self._popularity_ranking is None:
+                self._popularity_ranking = self._build_popularity_ranking()
+            return [dict(rec) for rec in self._popularity_ranking[:n_items]]
+            
+        except Exception as e:
+            self.logger.error(f"Error in popularity-based recommendations: {e}")
+            return []
+    
+    def _build_popularity_ranking(self) -> Tuple[Dict, ...]:
+        """Rank every interacted item by weighted popularity (count and average rating)."""
         try:
             # Calculate item popularity from interaction data
             item_counts = defaultdict(int)
@@ -596,7 +792,7 @@ class AdvancedRecommendationEngine:
             popular_items.sort(key=lambda x: x[1], reverse=True)
             
             recommendations = []
-            for item, pop_score, avg_rating in popular_items[:n_items]:
+            for item, pop_score, avg_rating in popular_items:
                 recommendations.append({
                     'item': item,
                     'score': min(avg_rating, 5.0),
@@ -605,11 +801,11 @@ class AdvancedRecommendationEngine:
                     'action': f"Trending {self.item_features.get(item, {}).get('category', 'item')} - popular choice!"
                 })
             
-            return recommendations
+            return tuple(recommendations)
             
         except Exception as e:
-            self.logger.error(f"Error in popularity-based recommendations: {e}")
-            return []
+            self.logger.error(f"Error building popularity ranking: {e}")
+            return ()
     
     def _trending_recommendations(self, user_id: Any, n_items: int) -> List[Dict]:
         """Generate trending item recommendations."""
@@ -782,8 +978,9 @@ class AdvancedRecommendationEngine:
             if not self.interaction_data:
                 return []
             
-            # Ensure user-item matrix is built
-            self._build_user_item_matrix()
+            # Build the user-item matrix on first use and after add_user_interaction() invalidates it
+            if self.user_item_matrix is None:
+                self._build_user_item_matrix()
             
             # Get recommendations from different collaborative filtering methods
             user_based_recs = self._user_based_collaborative_filtering(user_id, n_items * 2)
@@ -818,11 +1015,19 @@ class AdvancedRecommendationEngine:
             # Get user profile based on liked items
             user_profile = self._build_user_profile_from_content(user_id, user_items)
             
+            # Score every item embedding in one kernel call when Numba is installed
+            profile_similarities = None
+            if NUMBA_AVAILABLE and user_profile is not None:
+                profile_similarities = cosine_similarities(user_profile, self.item_embeddings)
+            
             # Calculate item similarities using content features
             recommendations = []
             for item_id in self.item_features.keys():
                 if item_id not in user_items:  # Don't recommend already interacted items
-                    similarity = self._calculate_content_similarity(user_profile, item_id)
+                    if profile_similarities is not None and item_id in self.item_to_embedding_idx:
+                        similarity = max(0, profile_similarities[self.item_to_embedding_idx[item_id]])
+                    else:
+                        similarity = self._calculate_content_similarity(user_profile, item_id)
                     if similarity > 0.1:  # Minimum similarity threshold
                         recommendations.append({
                             'item': item_id,
@@ -852,36 +1057,39 @@ class AdvancedRecommendationEngine:
             if user_features is None:
                 return []
             
-            # Get predictions for all items
-            recommendations = []
+            # Collect the feature rows of every candidate item
+            candidate_items = []
+            candidate_features = []
             for item_id in self.item_features.keys():
                 if user_id not in self.interaction_data or item_id not in self.interaction_data[user_id]:
                     # Prepare item features
                     item_features = self._prepare_item_features_for_neural(item_id)
                     if item_features is not None:
                         # Combine user and item features
-                        combined_features = np.concatenate([user_features, item_features])
-                        
-                        # Get neural network prediction
-                        try:
-                            if self.neural_scaler is not None:
-                                scaled_features = self.neural_scaler.transform([combined_features])
-                            else:
-                                scaled_features = [combined_features]
-                            
-                            prediction = self.neural_model.predict(scaled_features)[0]
-                            prediction = max(0, min(prediction, 5.0))  # Clamp to [0, 5]
-                            
-                            if prediction > 2.0:  # Minimum prediction threshold
-                                recommendations.append({
-                                    'item': item_id,
-                                    'score': prediction,
-                                    'reason': 'Neural network prediction',
-                                    'confidence': min(prediction / 5.0, 1.0)
-                                })
-                        except Exception as pred_e:
-                            self.logger.debug(f"Neural prediction error for {item_id}: {pred_e}")
-                            continue
+                        candidate_items.append(item_id)
+                        candidate_features.append(np.concatenate([user_features, item_features]))
+            
+            if not candidate_items:
+                return []
+            
+            # One scaler transform and one forward pass for all candidates, instead of one per item
+            if self.neural_scaler is not None:
+                scaled_features = self.neural_scaler.transform(candidate_features)
+            else:
+                scaled_features = candidate_features
+            predictions = self.neural_model.predict(scaled_features)
+            
+            recommendations = []
+            for item_id, prediction in zip(candidate_items, predictions):
+                prediction = max(0, min(prediction, 5.0))  # Clamp to [0, 5]
+                
+                if prediction > 2.0:  # Minimum prediction threshold
+                    recommendations.append({
+                        'item': item_id,
+                        'score': prediction,
+                        'reason': 'Neural network prediction',
+                        'confidence': min(prediction / 5.0, 1.0)
+                    })
             
             # Sort by score and return top items
             recommendations.sort(key=lambda x: x['score'], reverse=True)
@@ -905,50 +1113,18 @@ class AdvancedRecommendationEngine:
         """
         try:
             item = recommendation.get('item', '')
-            reason = recommendation.get('reason', '').lower()
             score = recommendation.get('score', 0)
             confidence = recommendation.get('confidence', 0.5)
+            code = _action_code(recommendation.get('reason', '').lower(), score, confidence)
             
             # Get item details if available
-            item_details = self.item_features.get(item, {})
-            category = item_details.get('category', 'item')
-            
-            # Generate action text based on recommendation source
-            if 'xgboost' in reason:
-                return f"Recommended by our AI model - {category} with {score:.1f}/5.0 predicted rating"
-            
-            elif 'similar users' in reason or 'user-based' in reason:
-                return f"Users with similar taste loved this {category} - try it because others like you rated it highly"
-            
-            elif 'similar items' in reason or 'item-based' in reason:
-                return f"Since you liked similar {category} items, this one is perfect for your taste"
-            
-            elif 'matrix factorization' in reason or 'pattern analysis' in reason:
-                return f"Our advanced analytics found this {category} matches your preferences perfectly"
+            category = self.item_features.get(item, {}).get('category', 'item')
             
-            elif 'content' in reason or 'similarity' in reason:
-                return f"Based on {category} features you love - same style, great quality"
-            
-            elif 'neural' in reason:
-                return f"AI deep learning suggests this {category} - {confidence:.0%} confidence match"
-            
-            elif 'collaborative' in reason:
-                if score > 4.0:
-                    return f"Highly recommended {category} - loved by your recommendation community"
-                else:
-                    return f"Good match {category} based on user behavior patterns"
-            
-            # Fallback based on score and confidence
-            if score > 4.5:
-                return f"Exceptional {category} - top recommendation just for you!"
-            elif score > 4.0:
-                return f"Great {category} choice - perfectly matched to your interests"
-            elif score > 3.5:
-                return f"Good {category} option - likely to interest you"
-            elif confidence > 0.8:
-                return f"High-confidence {category} recommendation tailored for you"
-            else:
-                return f"Consider this {category} - it might be a pleasant surprise"
+            if code == 'xgboost':
+                return ACTION_TEMPLATES[code] % (category, score)
+            if code == 'neural':
+                return ACTION_TEMPLATES[code] % (category, confidence * 100)
+            return ACTION_TEMPLATES[code] % category
                 
         except Exception as e:
             self.logger.error(f"Error generating action text: {e}")
@@ -988,28 +1164,18 @@ class AdvancedRecommendationEngine:
                 if source_weight <= 0:
                     continue
                 
-                # Normalize scores within source
-                if recs:
-                    max_score = max(rec.get('score', 0) for rec in recs)
-                    min_score = min(rec.get('score', 0) for rec in recs)
-                    score_range = max_score - min_score if max_score > min_score else 1.0
-                
-                for rec in recs:
+                # Reciprocal-rank blending: sources score on different scales, so each item
+                # contributes weight / rank within its source instead of a min-max scaled score
+                ranked_recs = sorted(recs, key=lambda rec: rec.get('score', 0), reverse=True)
+                for rank, rec in enumerate(ranked_recs, start=1):
                     item = rec.get('item')
                     if not item:
                         continue
                     
-                    # Normalize score to [0, 1]
-                    raw_score = rec.get('score', 0)
-                    normalized_score = (raw_score - min_score) / score_range if score_range > 0 else 0.5
-                    
-                    # Apply source weight
-                    weighted_score = normalized_score * source_weight
-                    
                     # Update item data
                     item_data = all_scored_items[item]
-                    item_data['total_score'] += weighted_score
-                    item_data['source_scores'][source] = raw_score
+                    item_data['total_score'] += source_weight / rank
+                    item_data['source_scores'][source] = rec.get('score', 0)
                     item_data['reasons'].append(rec.get('reason', ''))
                     item_data['confidences'].append(rec.get('confidence', 0.5))
                     item_data['source_count'] += 1
@@ -1219,24 +1385,35 @@ class AdvancedRecommendationEngine:
             self.item_to_idx = {item: idx for idx, item in enumerate(all_items)}
             self.idx_to_item = {idx: item for item, idx in self.item_to_idx.items()}
             
-            # Build matrix
+            # Build matrix: one contiguous block, filled with a single scatter
             n_users, n_items = len(all_users), len(all_items)
-            self.user_item_matrix = np.zeros((n_users, n_items))
-            
+            rows, cols, ratings = [], [], []
             for user, items in self.interaction_data.items():
                 user_idx = self.user_to_idx[user]
                 for item, rating in items.items():
-                    item_idx = self.item_to_idx[item]
-                    self.user_item_matrix[user_idx, item_idx] = rating
+                    rows.append(user_idx)
+                    cols.append(self.item_to_idx[item])
+                    ratings.append(rating)
+            
+            from scipy.sparse import csr_matrix
+            self.user_item_csr = csr_matrix((ratings, (rows, cols)), shape=(n_users, n_items))
+            self.user_item_csr.eliminate_zeros()
+            self.user_item_csr.sort_indices()
+            self.user_item_matrix = self.user_item_csr.toarray()
             
             # Create item-user matrix (transpose)
             self.item_user_matrix = self.user_item_matrix.T
             
+            # Item-item similarities are cached with the matrix, so item-based CF is a row lookup;
+            # computed on the sparse matrix, so only rated cells enter the products
+            from sklearn.metrics.pairwise import cosine_similarity
+            self.item_similarity_matrix = cosine_similarity(self.user_item_csr.T)
+            
             # Train matrix factorization models if we have enough data
             if n_users > 10 and n_items > 10:
                 self._train_matrix_factorization()
             
-            self.logger.debug(f"Built user-item matrix: {n_users} users x {n_items} items")
+            self.logger.debug("Built user-item matrix: %d users x %d items", n_users, n_items)
             
         except Exception as e:
             self.logger.error(f"Error building user-item matrix: {e}")
@@ -1244,8 +1421,8 @@ class AdvancedRecommendationEngine:
     def _train_matrix_factorization(self):
         """Train SVD and NMF models on the user-item matrix."""
         try:
-            # Convert to sparse matrix for efficiency
-            sparse_matrix = csr_matrix(self.user_item_matrix)
+            # SVD trains on the sparse matrix built alongside the dense one
+            sparse_matrix = self.user_item_csr
             
             # Train SVD
             if sparse_matrix.nnz > 0:  # Only if we have data
@@ -1271,11 +1448,15 @@ class AdvancedRecommendationEngine:
             user_idx = self.user_to_idx[user_id]
             user_vector = self.user_item_matrix[user_idx]
             
-            # Find similar users using cosine similarity
-            similarities = cosine_similarity([user_vector], self.user_item_matrix)[0]
+            # Find similar users using cosine similarity (compiled kernel when Numba is installed)
+            if NUMBA_AVAILABLE:
+                similarities = cosine_similarities(user_vector, self.user_item_matrix)
+            else:
+                from sklearn.metrics.pairwise import cosine_similarity
+                similarities = cosine_similarity([user_vector], self.user_item_matrix)[0]
             
             # Get top similar users (exclude self)
-            similar_users_idx = np.argsort(similarities)[::-1][1:21]  # Top 20 similar users
+            similar_users_idx = _top_k_indices(similarities, 21)[1:]  # Top 20 similar users
             
             # Get items liked by similar users that current user hasn't interacted with
             user_items = set(np.where(user_vector > 0)[0])
@@ -1307,7 +1488,7 @@ class AdvancedRecommendationEngine:
     def _item_based_collaborative_filtering(self, user_id: Any, n_items: int) -> List[Dict]:
         """Generate recommendations using item-based collaborative filtering."""
         try:
-            if user_id not in self.user_to_idx or self.item_user_matrix is None:
+            if user_id not in self.user_to_idx or self.item_similarity_matrix is None:
                 return []
             
             user_idx = self.user_to_idx[user_id]
@@ -1316,15 +1497,14 @@ class AdvancedRecommendationEngine:
             if len(user_items) == 0:
                 return []
             
-            # Calculate item-item similarities
-            item_similarities = cosine_similarity(self.item_user_matrix)
+            item_similarities = self.item_similarity_matrix
             
             recommendations = defaultdict(float)
             
             # For each item the user liked, find similar items
             for user_item_idx in user_items:
                 user_rating = self.user_item_matrix[user_idx, user_item_idx]
-                similar_items_idx = np.argsort(item_similarities[user_item_idx])[::-1][1:11]  # Top 10 similar items
+                similar_items_idx = _top_k_indices(item_similarities[user_item_idx], 11)[1:]  # Top 10 similar items
                 
                 for similar_item_idx in similar_items_idx:
                     similarity = item_similarities[user_item_idx, similar_item_idx]
@@ -1349,41 +1529,51 @@ class AdvancedRecommendationEngine:
     
     def _matrix_factorization_recommendations(self, user_id: Any, n_items: int) -> List[Dict]:
         """Generate recommendations using matrix factorization (SVD)."""
+        return self._matrix_factorization_batch([user_id], n_items)[0]
+    
+    def _matrix_factorization_batch(self, user_ids: List[Any], n_items: int) -> List[List[Dict]]:
+        """Matrix factorization (SVD) recommendations for several users at once.
+        With numba every user is scored in one parallel kernel call."""
         try:
-            if (user_id not in self.user_to_idx or 
-                self.user_factors is None or 
-                self.item_factors is None):
-                return []
-            
-            user_idx = self.user_to_idx[user_id]
-            user_vector = self.user_factors[user_idx]
-            
-            # Calculate scores for all items
-            item_scores = np.dot(user_vector, self.item_factors.T)
-            
-            # Get items user hasn't interacted with
-            user_items = set(np.where(self.user_item_matrix[user_idx] > 0)[0])
-            
-            # Sort and get top recommendations
-            item_score_pairs = [(idx, score) for idx, score in enumerate(item_scores) 
-                              if idx not in user_items]
-            item_score_pairs.sort(key=lambda x: x[1], reverse=True)
+            results = [[] for _ in user_ids]
+            if self.user_factors is None or self.item_factors is None or n_items <= 0:
+                return results
+            
+            positions = [pos for pos, user_id in enumerate(user_ids) if user_id in self.user_to_idx]
+            if not positions:
+                return results
+            user_rows = np.array([self.user_to_idx[user_ids[pos]] for pos in positions])
+            
+            if NUMBA_AVAILABLE:
+                # Items the users already rated are skipped inside the kernel
+                k = min(n_items, self.item_factors.shape[0])
+                top_idx, top_scores = top_k_dot_scores(self.user_factors[user_rows], self.item_factors,
+                                                       self.user_item_matrix[user_rows] > 0, k)
+            else:
+                top_idx, top_scores = [], []
+                for user_idx in user_rows:
+                    # Calculate scores for all items the user hasn't interacted with
+                    item_scores = np.dot(self.user_factors[user_idx], self.item_factors.T)
+                    candidate_idx = np.flatnonzero(self.user_item_matrix[user_idx] <= 0)
+                    
+                    # Select the top recommendations without sorting every candidate
+                    idx = candidate_idx[_top_k_indices(item_scores[candidate_idx], n_items)]
+                    top_idx.append(idx)
+                    top_scores.append(item_scores[idx])
             
-            recs = []
-            for item_idx, score in item_score_pairs[:n_items]:
-                if score > 0:  # Only positive scores
-                    recs.append({
-                        'item': self.idx_to_item[item_idx],
-                        'score': min(score, 5.0),
-                        'reason': 'Matrix factorization (SVD)',
-                        'confidence': min(score / 5.0, 1.0)
-                    })
+            for pos, item_row, score_row in zip(positions, top_idx, top_scores):
+                results[pos] = [{
+                    'item': self.idx_to_item[item_idx],
+                    'score': min(score, 5.0),
+                    'reason': 'Matrix factorization (SVD)',
+                    'confidence': min(score / 5.0, 1.0)
+                } for item_idx, score in zip(item_row, score_row) if score > 0]  # Only positive scores
             
-            return recs
+            return results
             
         except Exception as e:
             self.logger.error(f"Error in matrix factorization recommendations: {e}")
-            return []
+            return [[] for _ in user_ids]
     
     def _combine_collaborative_scores(self, user_based: List[Dict], item_based: List[Dict], 
                                     matrix_fact: List[Dict], n_items: int) -> List[Dict]:
@@ -1446,13 +1636,34 @@ class AdvancedRecommendationEngine:
         """Add a user-item interaction to the system."""
         try:
             self.interaction_data[user_id][item_id] = rating
-            # Invalidate matrices to trigger rebuild
-            self.user_item_matrix = None
-            self.item_user_matrix = None
-            self.logger.debug(f"Added interaction: {user_id} -> {item_id} ({rating})")
+            self._invalidate_interaction_caches()
+            self.logger.debug("Added interaction: %s -> %s (%s)", user_id, item_id, rating)
         except Exception as e:
             self.logger.error(f"Error adding user interaction: {e}")
     
+    def add_user_interactions(self, interactions: Iterable[Tuple[str, str, float]]):
+        """Add several (user_id, item_id, rating) interactions with a single cache invalidation."""
+        try:
+            count = 0
+            for user_id, item_id, rating in interactions:
+                self.interaction_data[user_id][item_id] = rating
+                count += 1
+            if count:
+                self._invalidate_interaction_caches()
+            self.logger.debug("Added %d interactions", count)
+        except Exception as e:
+            self.logger.error(f"Error adding user interactions: {e}")
+    
+    def _invalidate_interaction_caches(self):
+        """Drop everything derived from interaction_data so it is rebuilt on next use."""
+        # Invalidate matrices to trigger rebuild
+        self.user_item_matrix = None
+        self.user_item_csr = None
+        self.item_user_matrix = None
+        self.item_similarity_matrix = None
+        self._interaction_stats = None
+        self._popularity_ranking = None
+    
     def get_user_interactions(self, user_id: str) -> Dict[str, float]:
         """Get all interactions for a specific user."""
         return dict(self.interaction_data.get(user_id, {}))
@@ -1551,6 +1762,7 @@ class AdvancedRecommendationEngine:
             # 3. Categorical embeddings (encoded)
             if categorical_features:
                 if 'category' not in self.label_encoders:
+                    from sklearn.preprocessing import LabelEncoder
                     self.label_encoders['category'] = LabelEncoder()
                 encoded_categories = self.label_encoders['category'].fit_transform(categorical_features)
                 # Convert to one-hot
@@ -2095,6 +2307,13 @@ class AdvancedRecommendationEngine:
             # Get performance stats
             perf_stats = self.get_performance_stats()
             
+            # Counting interactions walks every user, so the counts are memoized until
+            # add_user_interaction() changes them
+            if self._interaction_stats is None:
+                self._interaction_stats = (len(self.interaction_data),
+                                           sum(len(items) for items in self.interaction_data.values()))
+            n_users, n_interactions = self._interaction_stats
+            
             return {
                 # Model status
                 'xgboost_loaded': self.xgboost_model is not None,
@@ -2107,9 +2326,9 @@ class AdvancedRecommendationEngine:
                 
                 # Data status
                 'item_features_loaded': len(self.item_features),
-                'interaction_data_size': len(self.interaction_data),
-                'users_in_system': len(self.interaction_data),
-                'total_interactions': sum(len(items) for items in self.interaction_data.values()),
+                'interaction_data_size': n_users,
+                'users_in_system': n_users,
+                'total_interactions': n_interactions,
                 
                 # Performance metrics
                 'performance': perf_stats,
@@ -2150,73 +2369,19 @@ class AdvancedRecommendationEngine:
     
     def clear_cache(self):
         """Clear recommendation cache."""
-        self.recommendation_cache.clear()
-        self.cache_access_times.clear()
-        self.cache_hits = 0
-        self.cache_misses = 0
+        self._reset_prediction_cache()
         self.logger.info("Recommendation cache cleared")
     
-    def _get_cache_key(self, user_id: Any, n_items: int) -> str:
-        """Generate cache key for user and parameters."""
-        return f"{user_id}_{n_items}"
+    def _reset_prediction_cache(self):
+        """(Re)create the predict() LRU cache at the configured size, with fresh hit/miss counters."""
+        self._predict_cached = lru_cache(maxsize=self.config.get('cache_size', 1000))(self._predict_uncached)
     
-    def _get_contextual_cache_key(self, user_id: Any, n_items: int, context: Optional[Dict]) -> str:
-        """Generate context-aware cache key."""
+    @staticmethod
+    def _freeze_context(context: Optional[Dict]) -> Optional[Tuple]:
+        """Turn a context dict into a hashable, order-independent cache key component."""
         if not context:
-            return self._get_cache_key(user_id, n_items)
-        
-        # Include relevant context elements in cache key
-        context_key = ""
-        if context:
-            time_of_day = context.get('time_of_day', 'any')
-            device_type = context.get('device_type', 'any')
-            session_type = context.get('session_type', 'any')
-            domain = context.get('domain', 'any')
-            context_key = f"_{time_of_day}_{device_type}_{session_type}_{domain}"
-        
-        return f"{user_id}_{n_items}{context_key}"
-    
-    def _get_from_cache(self, cache_key: str) -> Optional[List[Dict]]:
-        """Get recommendations from cache."""
-        try:
-            if cache_key in self.recommendation_cache:
-                # Update access time
-                import time
-                self.cache_access_times[cache_key] = time.time()
-                self.cache_hits += 1
-                return self.recommendation_cache[cache_key].copy()
-            else:
-                self.cache_misses += 1
-                return None
-        except Exception as e:
-            self.logger.error(f"Cache retrieval error: {e}")
             return None
-    
-    def _add_to_cache(self, cache_key: str, recommendations: List[Dict]):
-        """Add recommendations to cache with LRU eviction."""
-        try:
-            import time
-            current_time = time.time()
-            
-            # Add to cache
-            self.recommendation_cache[cache_key] = recommendations.copy()
-            self.cache_access_times[cache_key] = current_time
-            
-            # Evict old entries if cache is full
-            max_cache_size = self.config.get('cache_size', 1000)
-            if len(self.recommendation_cache) > max_cache_size:
-                # Find least recently used entries
-                sorted_keys = sorted(self.cache_access_times.items(), key=lambda x: x[1])
-                keys_to_remove = [key for key, _ in sorted_keys[:-max_cache_size]]
-                
-                for key in keys_to_remove:
-                    self.recommendation_cache.pop(key, None)
-                    self.cache_access_times.pop(key, None)
-                
-                self.logger.debug(f"Evicted {len(keys_to_remove)} cache entries")
-                
-        except Exception as e:
-            self.logger.error(f"Cache storage error: {e}")
+        return tuple(sorted(context.items(), key=lambda kv: str(kv[0])))
     
     def _log_performance(self, method: str, execution_time: float, cache_hit: bool, result_count: int, error: bool = False):
         """Log performance metrics."""
@@ -2253,17 +2418,18 @@ class AdvancedRecommendationEngine:
             # Calculate statistics
             total_requests = len(self.performance_logs)
             avg_execution_time = np.mean([log['execution_time'] for log in self.performance_logs])
-            cache_hit_rate = self.cache_hits / (self.cache_hits + self.cache_misses) if (self.cache_hits + self.cache_misses) > 0 else 0
+            cache_info = self._predict_cached.cache_info()
+            cache_hit_rate = cache_info.hits / (cache_info.hits + cache_info.misses) if (cache_info.hits + cache_info.misses) > 0 else 0
             error_rate = sum(1 for log in self.performance_logs if log['error']) / total_requests
             
             return {
                 'total_requests': total_requests,
                 'avg_execution_time': round(avg_execution_time, 4),
                 'cache_hit_rate': round(cache_hit_rate, 3),
-                'cache_hits': self.cache_hits,
-                'cache_misses': self.cache_misses,
+                'cache_hits': cache_info.hits,
+                'cache_misses': cache_info.misses,
                 'error_rate': round(error_rate, 3),
-                'cache_size': len(self.recommendation_cache)
+                'cache_size': cache_info.currsize
             }
             
         except Exception as e:
@@ -2337,7 +2503,7 @@ class AdvancedRecommendationEngine:
                     new_rating = min(5.0, max(1.0, current_rating + feedback_score))
                     self.add_user_interaction(user_id, item_id, new_rating)
                 
-                self.logger.debug(f"Added feedback: {user_id} -> {item_id} ({feedback_type}: {feedback_score})")
+                self.logger.debug("Added feedback: %s -> %s (%s: %s)", user_id, item_id, feedback_type, feedback_score)
                 
         except Exception as e:
             self.logger.error(f"Error adding real-time feedback: {e}")
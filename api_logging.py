@@ -0,0 +1,20 @@
+"""
+API Logging
+Logger setup shared by the recommendation APIs
+"""
+
+import logging
+import os
+
+def get_api_logger(name):
+    """Logger with its own stream handler; LOG_LEVEL (default INFO) sets the level.
+    LOG_LEVEL=WARNING in production turns the per-request info logs into no-ops"""
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+        # Records are written by this handler; propagating would print each one again via root
+        logger.propagate = False
+    return logger
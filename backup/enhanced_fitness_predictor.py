@@ -1,32 +1,99 @@
 # Enhanced Multi-Output Fitness Predictor with Ultimate AI Integration + Smart Recommendations v3.0
 # enhanced_fitness_predictor.py
+#
+# Production (threaded workers with persistent connections, debug off):
+#   PRELOAD_MODEL=1 gunicorn --preload --workers 4 --worker-class gthread --threads 8 \
+#       --keep-alive 30 -b 0.0.0.0:5002 enhanced_fitness_predictor:app
+# The model is then loaded once in the master and shared copy-on-write by the forked workers.
+# `python enhanced_fitness_predictor.py` runs the Werkzeug dev server; set FLASK_DEBUG=1 for debug mode.
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
+import logging
+import os
+import threading
 import joblib
 import pandas as pd
 import numpy as np
 import traceback
-from sklearn.ensemble import RandomForestRegressor
+from lightgbm import LGBMRegressor
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, r2_score
 import math
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
 from typing import Dict, List, Any, Optional
+from dataclasses import dataclass
 from datetime import datetime
 
+try:
+    from api_logging import get_api_logger
+    logger = get_api_logger(__name__)
+except ImportError:  # run from backup/ without the repo root on sys.path
+    logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
+    logger = logging.getLogger(__name__)
+
 # Import Ultimate Fitness AI for enhanced recommendations
 try:
     from ultimate_fitness_ai import UltimateFitnessAI, get_ultimate_fitness_recommendations
     ULTIMATE_AI_AVAILABLE = True
-    print("✅ Ultimate Fitness AI (30/30 + BERT4Rec) loaded!")
+    logger.info("✅ Ultimate Fitness AI (30/30 + BERT4Rec) loaded!")
 except ImportError:
     ULTIMATE_AI_AVAILABLE = False
-    print("⚠️ Ultimate Fitness AI not available, using standard predictions")
+    logger.warning("⚠️ Ultimate Fitness AI not available, using standard predictions")
+
+# orjson serializes the nested recommendation dicts much faster than stdlib json
+try:
+    from orjson import dumps as orjson_dumps, OPT_SERIALIZE_NUMPY
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
+def fast_json(obj):
+    """Serialize a response payload with orjson, falling back to jsonify"""
+    if ORJSON_AVAILABLE:
+        return Response(orjson_dumps(obj, option=OPT_SERIALIZE_NUMPY), mimetype='application/json')
+    return jsonify(obj)
+
+@dataclass(frozen=True)
+class UserContext:
+    """User fields read by the recommendation helpers, extracted once per request."""
+    age: float
+    gender: str  # lower-cased
+    weight: float
+    height: float
+    duration: float
+    intensity: str  # lower-cased
+    hr: float
+    resting_hr: float
+    bmi: float
+    workout_type: str  # lower-cased
+    sleep_hours: float
+    water_today: float
+    calories_burned: float
+    
+    @classmethod
+    def from_request(cls, user_data: Dict[str, Any], predictions: Dict[str, float]) -> 'UserContext':
+        return cls(
+            age=user_data.get('Age', 30),
+            gender=user_data.get('Gender', 'Male').lower(),
+            weight=user_data.get('Weight (kg)', 70),
+            height=user_data.get('Height (cm)', 170),
+            duration=user_data.get('Workout Duration (mins)', 30),
+            intensity=user_data.get('Workout Intensity', 'Medium').lower(),
+            hr=user_data.get('Heart Rate (bpm)', 140),
+            resting_hr=user_data.get('Resting Heart Rate (bpm)', 70),
+            bmi=user_data.get('BMI', 25),
+            workout_type=user_data.get('Workout Type', 'Running').lower(),
+            sleep_hours=user_data.get('Sleep Hours', 8),
+            water_today=user_data.get('water_intake_today_ml', 1000),
+            calories_burned=predictions.get('calories_burned', 300)
+        )
+
 # Enhanced Smart Recommendations Engine - Integrated into existing API
 class SmartRecommendationsEngine:
     """
@@ -54,47 +121,70 @@ class SmartRecommendationsEngine:
             'endurance': {'carbs': 0.55, 'protein': 0.20, 'fat': 0.25},
             'general_fitness': {'carbs': 0.45, 'protein': 0.25, 'fat': 0.30}
         }
+        
+        # Sorted thresholds + labels for the status lookups (one bisect instead of an if/elif chain)
+        self._HR_THRESHOLDS = (60, 70, 80, 90)
+        self._HR_LABELS = (
+            "Recovery zone (<60% max HR)",
+            "Fat burning zone (60-70% max HR)",
+            "Aerobic zone (70-80% max HR)",
+            "Anaerobic zone (80-90% max HR)",
+            "Red line zone (>90% max HR)"
+        )
+        self._HYDRATION_THRESHOLDS = (0.5, 0.7, 0.9)
+        self._HYDRATION_LABELS = ("Dehydration risk", "Mild dehydration", "Adequately hydrated", "Well hydrated")
+        self._PERFORMANCE_THRESHOLDS = (5, 8, 12, 15)
+        self._PERFORMANCE_LABELS = ("Beginner level", "Beginner+ level", "Intermediate level", "Advanced level", "Elite level")
+        
+        self._cached_recommendations = lru_cache(maxsize=1024, typed=True)(self._build_recommendations)
     
     def generate_smart_recommendations(self, user_data: Dict[str, Any], predictions: Dict[str, float]) -> Dict[str, Any]:
         """Generate comprehensive smart recommendations based on user data and predictions."""
         
+        ctx = UserContext.from_request(user_data, predictions)
+        
+        # Everything but the timestamp is a pure function of ctx, so repeat users hit the cache;
+        # field values are passed positionally so typed=True keeps 30 and 30.0 apart
+        recommendations = dict(self._cached_recommendations(*vars(ctx).values()))
+        recommendations['timestamp'] = datetime.now().isoformat()
+        
+        return recommendations
+    
+    def _build_recommendations(self, *fields) -> Dict[str, Any]:
+        """Build the recommendation sections for one UserContext (shared by cache hits, do not mutate)."""
+        ctx = UserContext(*fields)
+        
         # Enhanced recommendations
         recommendations = {
-            'water_intake_detailed': self._calculate_detailed_hydration(user_data, predictions),
-            'macro_nutrition_breakdown': self._calculate_nutrition_breakdown(user_data, predictions),
-            'foods_to_avoid': self._get_foods_to_avoid(user_data),
-            'who_guidelines_compliance': self._assess_who_guidelines(user_data, predictions),
-            'pre_post_workout_advice': self._get_workout_timing_advice(user_data, predictions),
-            'performance_improvement_tips': self._get_performance_tips(user_data, predictions),
-            'timestamp': datetime.now().isoformat()
+            'water_intake_detailed': self._calculate_detailed_hydration(ctx),
+            'macro_nutrition_breakdown': self._calculate_nutrition_breakdown(ctx),
+            'foods_to_avoid': self._get_foods_to_avoid(ctx),
+            'who_guidelines_compliance': self._assess_who_guidelines(ctx),
+            'pre_post_workout_advice': self._get_workout_timing_advice(ctx),
+            'performance_improvement_tips': self._get_performance_tips(ctx)
         }
         
         return recommendations
     
-    def _calculate_detailed_hydration(self, user_data: Dict[str, Any], predictions: Dict[str, float]) -> Dict[str, Any]:
+    def _calculate_detailed_hydration(self, ctx: UserContext) -> Dict[str, Any]:
         """Calculate detailed hydration recommendations."""
         
-        gender = user_data.get('Gender', 'Male').lower()
-        base_needs = self.WHO_WATER_INTAKE.get(gender, 3000)
+        base_needs = self.WHO_WATER_INTAKE.get(ctx.gender, 3000)
         
         # Additional needs based on workout
-        duration_hours = user_data.get('Workout Duration (mins)', 30) / 60
-        intensity = user_data.get('Workout Intensity', 'Medium').lower()
+        duration_hours = ctx.duration / 60
         
-        intensity_multiplier = {'low': 400, 'medium': 600, 'high': 800}.get(intensity, 600)
+        intensity_multiplier = {'low': 400, 'medium': 600, 'high': 800}.get(ctx.intensity, 600)
         exercise_water = duration_hours * intensity_multiplier
         
         # Heart rate based sweat rate
-        hr = user_data.get('Heart Rate (bpm)', 140)
-        resting_hr = user_data.get('Resting Heart Rate (bpm)', 70)
-        sweat_rate = 500 * (hr / resting_hr) if resting_hr > 0 else 500
+        sweat_rate = 500 * (ctx.hr / ctx.resting_hr) if ctx.resting_hr > 0 else 500
         
         # Sleep dehydration recovery
-        sleep_hours = user_data.get('Sleep Hours', 8)
-        sleep_dehydration = max(0, (8 - sleep_hours) * 100)
+        sleep_dehydration = max(0, (8 - ctx.sleep_hours) * 100)
         
         total_needs = min(base_needs + exercise_water + sweat_rate + sleep_dehydration, 5000)
-        current_intake = user_data.get('water_intake_today_ml', 1000)
+        current_intake = ctx.water_today
         
         return {
             'total_daily_needs_ml': round(total_needs),
@@ -103,7 +193,7 @@ class SmartRecommendationsEngine:
             'hydration_status': self._get_hydration_status(current_intake, total_needs),
             'pre_workout_ml': 500,
             'during_workout_ml': round(duration_hours * 600),
-            'post_workout_ml': round(predictions.get('calories_burned', 300) * 1.5),
+            'post_workout_ml': round(ctx.calories_burned * 1.5),
             'hourly_target_ml': round(total_needs / 16),  # Over 16 waking hours
             'hydration_tips': [
                 "Monitor urine color - pale yellow is ideal",
@@ -113,26 +203,24 @@ class SmartRecommendationsEngine:
             ]
         }
     
-    def _calculate_nutrition_breakdown(self, user_data: Dict[str, Any], predictions: Dict[str, float]) -> Dict[str, Any]:
+    def _calculate_nutrition_breakdown(self, ctx: UserContext) -> Dict[str, Any]:
         """Calculate detailed macro nutrition breakdown."""
         
         # Calculate BMR and TDEE
-        age = user_data.get('Age', 30)
-        gender = user_data.get('Gender', 'Male').lower()
-        weight = user_data.get('Weight (kg)', 70)
-        height = user_data.get('Height (cm)', 170)
+        age = ctx.age
+        weight = ctx.weight
+        height = ctx.height
         
         # BMR calculation
-        if gender == 'male':
+        if ctx.gender == 'male':
             bmr = 10 * weight + 6.25 * height - 5 * age + 5
         else:
             bmr = 10 * weight + 6.25 * height - 5 * age - 161
         
         # Activity level multiplier (estimated from workout data)
-        intensity = user_data.get('Workout Intensity', 'Medium').lower()
-        duration = user_data.get('Workout Duration (mins)', 30)
+        intensity = ctx.intensity
         
-        if intensity == 'high' and duration > 45:
+        if intensity == 'high' and ctx.duration > 45:
             activity_multiplier = 1.725  # Very active
         elif intensity in ['medium', 'high']:
             activity_multiplier = 1.55   # Moderately active
@@ -142,10 +230,10 @@ class SmartRecommendationsEngine:
         tdee = bmr * activity_multiplier
         
         # Fitness goal (estimated from workout type and user profile)
-        workout_type = user_data.get('Workout Type', 'Running').lower()
+        workout_type = ctx.workout_type
         if workout_type in ['weightlifting', 'strength training']:
             fitness_goal = 'muscle_gain'
-        elif user_data.get('BMI', 25) > 25:
+        elif ctx.bmi > 25:
             fitness_goal = 'weight_loss'
         elif workout_type in ['running', 'cycling', 'swimming']:
             fitness_goal = 'endurance'
@@ -193,7 +281,7 @@ class SmartRecommendationsEngine:
             'post_workout_nutrition': {
                 'timing': 'Within 30 minutes',
                 'protein_g': round(protein_g * 0.20, 1),
-                'carbs_g': round(min(carb_g * 0.25, predictions.get('calories_burned', 300) / 4), 1),
+                'carbs_g': round(min(carb_g * 0.25, ctx.calories_burned / 4), 1),
                 'examples': ['Chocolate milk (3:1 ratio)', 'Protein shake with banana', 'Greek yogurt with berries']
             },
             'food_sources': {
@@ -203,7 +291,7 @@ class SmartRecommendationsEngine:
             }
         }
     
-    def _get_foods_to_avoid(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _get_foods_to_avoid(self, ctx: UserContext) -> Dict[str, Any]:
         """Get foods to avoid based on goals and timing."""
         
         return {
@@ -233,7 +321,7 @@ class SmartRecommendationsEngine:
                 "High-fat dairy products",
                 "Liquid calories (smoothies, juices)",
                 "Large portion sizes"
-            ] if user_data.get('BMI', 25) > 25 else [],
+            ] if ctx.bmi > 25 else [],
             'portion_control_tips': [
                 "Use hand-size portions for protein",
                 "Cupped hand for carbs",
@@ -242,17 +330,15 @@ class SmartRecommendationsEngine:
             ]
         }
     
-    def _assess_who_guidelines(self, user_data: Dict[str, Any], predictions: Dict[str, float]) -> Dict[str, Any]:
+    def _assess_who_guidelines(self, ctx: UserContext) -> Dict[str, Any]:
         """Assess WHO guidelines compliance and fat burning recommendations."""
         
-        age = user_data.get('Age', 30)
-        duration = user_data.get('Workout Duration (mins)', 30)
-        intensity = user_data.get('Workout Intensity', 'Medium').lower()
-        hr = user_data.get('Heart Rate (bpm)', 140)
+        duration = ctx.duration
+        hr = ctx.hr
         
         # Estimate weekly activity (simplified)
         weekly_sessions = 3  # Assume 3x per week
-        if intensity == 'high':
+        if ctx.intensity == 'high':
             weekly_vigorous = duration * weekly_sessions
             weekly_moderate = 0
         else:
@@ -262,7 +348,7 @@ class SmartRecommendationsEngine:
         meets_guidelines = (weekly_moderate >= 150) or (weekly_vigorous >= 75)
         
         # Fat burning zone calculation
-        max_hr = 220 - age
+        max_hr = 220 - ctx.age
         fat_burn_lower = int(max_hr * 0.60)
         fat_burn_upper = int(max_hr * 0.70)
         current_hr_zone = self._get_hr_zone(hr, max_hr)
@@ -280,7 +366,7 @@ class SmartRecommendationsEngine:
                 'current_hr_zone': current_hr_zone,
                 'in_fat_burn_zone': fat_burn_lower <= hr <= fat_burn_upper,
                 'calorie_deficit_target': "300-500 calories below TDEE for 1-2 lbs/week weight loss",
-                'current_session_burn': f"{predictions.get('calories_burned', 300):.0f} calories"
+                'current_session_burn': f"{ctx.calories_burned:.0f} calories"
             },
             'recommendations': [
                 "Aim for 150 min moderate OR 75 min vigorous activity weekly",
@@ -290,12 +376,11 @@ class SmartRecommendationsEngine:
             ]
         }
     
-    def _get_workout_timing_advice(self, user_data: Dict[str, Any], predictions: Dict[str, float]) -> Dict[str, Any]:
+    def _get_workout_timing_advice(self, ctx: UserContext) -> Dict[str, Any]:
         """Get pre and post workout timing advice."""
         
-        calories_burned = predictions.get('calories_burned', 300)
-        intensity = user_data.get('Workout Intensity', 'Medium').lower()
-        duration = user_data.get('Workout Duration (mins)', 30)
+        calories_burned = ctx.calories_burned
+        duration = ctx.duration
         
         return {
             'pre_workout': {
@@ -327,14 +412,12 @@ class SmartRecommendationsEngine:
             }
         }
     
-    def _get_performance_tips(self, user_data: Dict[str, Any], predictions: Dict[str, float]) -> Dict[str, Any]:
+    def _get_performance_tips(self, ctx: UserContext) -> Dict[str, Any]:
         """Get performance improvement recommendations."""
         
-        calories_burned = predictions.get('calories_burned', 300)
-        duration = user_data.get('Workout Duration (mins)', 30)
-        efficiency = calories_burned / duration if duration > 0 else 0
-        workout_type = user_data.get('Workout Type', 'Running').lower()
-        age = user_data.get('Age', 30)
+        duration = ctx.duration
+        efficiency = ctx.calories_burned / duration if duration > 0 else 0
+        workout_type = ctx.workout_type
         
         return {
             'current_performance': {
@@ -350,7 +433,7 @@ class SmartRecommendationsEngine:
             'technique_optimization': self._get_technique_tips(workout_type),
             'cross_training': self._get_cross_training(workout_type),
             'recovery_optimization': {
-                'sleep_target': f"{8 + (0.5 if user_data.get('Workout Intensity', 'Medium').lower() == 'high' else 0)} hours",
+                'sleep_target': f"{8 + (0.5 if ctx.intensity == 'high' else 0)} hours",
                 'active_recovery': ["Light walking", "Stretching", "Foam rolling"],
                 'rest_days': "1-2 complete rest days per week"
             },
@@ -364,25 +447,14 @@ class SmartRecommendationsEngine:
     # Helper methods
     def _get_hydration_status(self, current: int, needs: float) -> str:
         ratio = current / needs if needs > 0 else 0
-        if ratio >= 0.9: return "Well hydrated"
-        elif ratio >= 0.7: return "Adequately hydrated" 
-        elif ratio >= 0.5: return "Mild dehydration"
-        else: return "Dehydration risk"
+        return self._HYDRATION_LABELS[bisect_right(self._HYDRATION_THRESHOLDS, ratio)]
     
     def _get_hr_zone(self, hr: int, max_hr: int) -> str:
         percentage = (hr / max_hr) * 100
-        if percentage < 60: return "Recovery zone (<60% max HR)"
-        elif percentage < 70: return "Fat burning zone (60-70% max HR)"
-        elif percentage < 80: return "Aerobic zone (70-80% max HR)"
-        elif percentage < 90: return "Anaerobic zone (80-90% max HR)"
-        else: return "Red line zone (>90% max HR)"
+        return self._HR_LABELS[bisect_right(self._HR_THRESHOLDS, percentage)]
     
     def _get_performance_level(self, efficiency: float) -> str:
-        if efficiency > 15: return "Elite level"
-        elif efficiency > 12: return "Advanced level"
-        elif efficiency > 8: return "Intermediate level"
-        elif efficiency > 5: return "Beginner+ level"
-        else: return "Beginner level"
+        return self._PERFORMANCE_LABELS[bisect_left(self._PERFORMANCE_THRESHOLDS, efficiency)]
     
     def _get_technique_tips(self, workout_type: str) -> List[str]:
         tips = {
@@ -405,10 +477,66 @@ class SmartRecommendationsEngine:
 # Initialize the Smart Recommendations Engine
 smart_recommendations = SmartRecommendationsEngine()
 
-# Load the original dataset to create a multi-output model
-try:
-    df = pd.read_csv('workout_fitness_tracker_data.csv')
-    print("✅ Dataset loaded successfully!")
+DATASET_PATH = 'workout_fitness_tracker_data.csv'
+# Also read by working_model_loader.read_enhanced_model_data (and through it by
+# ultimate_recommendation_engine); keep the layouts in sync
+MODEL_ARRAYS_PATH = 'enhanced_fitness_model.npz'
+MODEL_BOOSTERS_PATH = 'enhanced_fitness_boosters.pkl'
+ENCODER_NAMES = ['gender', 'workout_type', 'intensity', 'mood_before', 'mood_after']
+
+def save_model_data(model_data):
+    """Persist encoders/scalers as raw arrays and only the boosters via joblib"""
+    output_targets = model_data['output_targets']
+    arrays = {
+        'feature_cols': np.array(model_data['feature_cols']),
+        'input_features': np.array(model_data['input_features']),
+        'output_targets': np.array(output_targets),
+        'scaler_mean': model_data['scaler'][0],
+        'scaler_scale': model_data['scaler'][1]
+    }
+    for name in ENCODER_NAMES:
+        arrays[f'{name}_classes'] = np.array(list(model_data['encoders'][name]))
+    
+    np.savez_compressed(MODEL_ARRAYS_PATH, **arrays)
+    joblib.dump(model_data['models'], MODEL_BOOSTERS_PATH, compress=3)
+
+def load_model_data():
+    """Rebuild the inference-time model_data dict without unpickling sklearn encoders"""
+    with np.load(MODEL_ARRAYS_PATH) as arrays:
+        output_targets = arrays['output_targets'].tolist()
+        return {
+            'models': joblib.load(MODEL_BOOSTERS_PATH),
+            'scaler': (arrays['scaler_mean'], arrays['scaler_scale']),
+            'encoders': {
+                name: {label: code for code, label in enumerate(arrays[f'{name}_classes'].tolist())}
+                for name in ENCODER_NAMES
+            },
+            'feature_cols': arrays['feature_cols'].tolist(),
+            'input_features': arrays['input_features'].tolist(),
+            'output_targets': output_targets
+        }
+
+def model_cache_is_fresh():
+    """True when the saved model files exist and are newer than the dataset"""
+    paths = [MODEL_ARRAYS_PATH, MODEL_BOOSTERS_PATH]
+    if not all(os.path.exists(path) for path in paths):
+        return False
+    if not os.path.exists(DATASET_PATH):
+        return True
+    dataset_mtime = os.path.getmtime(DATASET_PATH)
+    return all(os.path.getmtime(path) >= dataset_mtime for path in paths)
+
+def encode_label(encoder_name, value):
+    """Map a categorical value to the code its LabelEncoder assigned at training time"""
+    try:
+        return model_data['encoders'][encoder_name][value]
+    except KeyError:
+        raise ValueError(f"Unknown value {value!r} for {encoder_name}")
+
+def train_model_data():
+    """Load the original dataset and train a multi-output model"""
+    df = pd.read_csv(DATASET_PATH)
+    logger.info("✅ Dataset loaded successfully!")
     
     # Prepare features and multiple targets
     # Input features (what users provide)
@@ -427,9 +555,9 @@ try:
     
     # We'll also calculate VO2 MAX as a derived metric
     
-    print(f"Input features: {input_features}")
-    print(f"Output targets: {output_targets}")
-    print("✅ Enhanced Smart Recommendations Engine integrated!")
+    logger.info("Input features: %s", input_features)
+    logger.info("Output targets: %s", output_targets)
+    logger.info("✅ Enhanced Smart Recommendations Engine integrated!")
     
     # Prepare the data
     X = df[input_features].copy()
@@ -465,54 +593,90 @@ try:
     # Split data
     X_train, X_test, y_train, y_test = train_test_split(X_final, y, test_size=0.2, random_state=42)
     
+    # Scale features once - every target is trained on the same X_train
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+    
     # Train separate models for each target (better than multi-output for different scales)
     models = {}
-    scalers = {}
     
     for target in output_targets:
-        print(f"Training model for {target}...")
-        
-        # Scale features
-        scaler = StandardScaler()
-        X_train_scaled = scaler.fit_transform(X_train)
-        X_test_scaled = scaler.transform(X_test)
+        logger.info("Training model for %s...", target)
         
         # Train model
-        model = RandomForestRegressor(n_estimators=200, random_state=42, n_jobs=-1)
+        model = LGBMRegressor(n_estimators=500, max_depth=6, random_state=42, n_jobs=-1)
         model.fit(X_train_scaled, y_train[target])
-        
-        # Evaluate
-        y_pred = model.predict(X_test_scaled)
-        mae = mean_absolute_error(y_test[target], y_pred)
-        r2 = r2_score(y_test[target], y_pred)
-        
-        print(f"  {target}: MAE={mae:.2f}, R²={r2:.4f}")
-        
         models[target] = model
-        scalers[target] = scaler
     
-    # Save encoders and models
+    # Evaluate all targets in one pass on a stacked (n_samples, n_targets) matrix
+    y_pred = np.column_stack([models[target].predict(X_test_scaled) for target in output_targets])
+    maes = mean_absolute_error(y_test[output_targets], y_pred, multioutput='raw_values')
+    r2s = r2_score(y_test[output_targets], y_pred, multioutput='raw_values')
+    
+    for target, mae, r2 in zip(output_targets, maes, r2s):
+        logger.info("  %s: MAE=%.2f, R²=%.4f", target, mae, r2)
+    
+    # Keep only the raw arrays needed at inference time
+    encoders = {
+        'gender': le_gender,
+        'workout_type': le_workout,
+        'intensity': le_intensity,
+        'mood_before': le_mood_before,
+        'mood_after': le_mood_after
+    }
     model_data = {
         'models': models,
-        'scalers': scalers,
+        'scaler': (scaler.mean_, scaler.scale_),
         'encoders': {
-            'gender': le_gender,
-            'workout_type': le_workout,
-            'intensity': le_intensity,
-            'mood_before': le_mood_before,
-            'mood_after': le_mood_after
+            name: {label: code for code, label in enumerate(encoder.classes_.tolist())}
+            for name, encoder in encoders.items()
         },
         'feature_cols': feature_cols,
         'input_features': input_features,
         'output_targets': output_targets
     }
     
-    joblib.dump(model_data, 'enhanced_fitness_model.pkl')
-    print("✅ Enhanced multi-output model saved!")
-    
-except Exception as e:
-    print(f"❌ Error creating enhanced model: {e}")
-    model_data = None
+    save_model_data(model_data)
+    logger.info("✅ Enhanced multi-output model saved!")
+    return model_data
+
+# The model is loaded (or trained) in the background so the server can start
+# answering immediately; /predict returns 503 until model_ready is set.
+# With PRELOAD_MODEL=1 (gunicorn --preload) it is loaded synchronously instead,
+# since the loader thread would not survive the fork into the workers.
+model_data = None
+model_ready = threading.Event()
+
+def _load_or_train():
+    global model_data
+    try:
+        if model_cache_is_fresh():
+            model_data = load_model_data()
+            logger.info("✅ Enhanced multi-output model loaded from cache!")
+        else:
+            model_data = train_model_data()
+        
+    except Exception as e:
+        logger.error("❌ Error creating enhanced model: %s", e)
+        model_data = None
+    finally:
+        model_ready.set()
+
+if os.environ.get('PRELOAD_MODEL') == '1':
+    _load_or_train()
+else:
+    threading.Thread(target=_load_or_train, daemon=True).start()
+
+# Ultimate AI fields echoed in /predict and the decimal scale each is rounded to
+ULTIMATE_PREDICTION_KEYS = ('efficiency', 'fatigue_level', 'recovery_time', 'performance_score')
+ULTIMATE_PREDICTION_SCALE = np.array([100.0, 10.0, 10.0, 10.0])
+
+def round_ultimate_predictions(ultimate_predictions):
+    """Round all Ultimate AI prediction fields in one vectorized pass"""
+    values = np.array([ultimate_predictions.get(key, 0) for key in ULTIMATE_PREDICTION_KEYS], dtype=np.float64)
+    rounded = np.rint(values * ULTIMATE_PREDICTION_SCALE) / ULTIMATE_PREDICTION_SCALE
+    return dict(zip(ULTIMATE_PREDICTION_KEYS, rounded.tolist()))
 
 def calculate_vo2_max(age, gender, heart_rate, resting_hr, duration, intensity):
     """Calculate estimated VO2 Max based on workout data"""
@@ -565,7 +729,7 @@ def enhanced_calorie_calculation(predicted_calories, age, weight, gender, durati
 
 @app.route('/', methods=['GET'])
 def home():
-    return jsonify({
+    return fast_json({
         'message': 'Enhanced Fitness Tracker Multi-Output Predictor',
         'version': '2.0',
         'features': {
@@ -581,221 +745,236 @@ def home():
             ]
         },
         'endpoints': {
-            'predict': 'POST /predict',
+            'predict': 'POST /predict (one record or a list of records)',
             'health': 'GET /health'
         }
     })
 
+def get_ultimate_ai_predictions(data):
+    """Try Ultimate Fitness AI first (your 30/30 + BERT4Rec model); None when unavailable"""
+    ultimate_predictions = None
+    if ULTIMATE_AI_AVAILABLE:
+        try:
+            # Convert to Ultimate AI format
+            current_workout = {
+                'age': data['Age'],
+                'weight': data['Weight (kg)'],
+                'height': data['Height (cm)'],
+                'gender': data['Gender'],
+                'workout_type': data['Workout Type'],
+                'duration': data['Workout Duration (mins)'],
+                'intensity': data['Workout Intensity'],
+                'heart_rate': data['Heart Rate (bpm)'],
+                'mood_before': data['Mood Before Workout'],
+                'mood_after': data['Mood After Workout'],
+                'weather_temp': 20,
+                'sleep_hours': 7,
+                'water_intake': 2
+            }
+            
+            # Get workout history if provided
+            workout_history = data.get('workout_history', [])
+            
+            # Get Ultimate AI prediction
+            ultimate_result = get_ultimate_fitness_recommendations(current_workout, workout_history)
+            ultimate_predictions = ultimate_result
+            logger.info("✅ Ultimate AI prediction successful: %s calories", ultimate_result.get('calories_burned', 0))
+            
+        except Exception as e:
+            logger.warning("⚠️ Ultimate AI failed, falling back to standard model: %s", e)
+    
+    return ultimate_predictions
+
+def build_feature_row(data):
+    """Encode categorical variables and add engineered features as plain scalars"""
+    bmi = data['Weight (kg)'] / (data['Height (cm)'] / 100) ** 2
+    heart_rate_intensity = data['Heart Rate (bpm)'] / data['Resting Heart Rate (bpm)']
+    engineered = {
+        'Gender_encoded': encode_label('gender', data['Gender']),
+        'Workout Type_encoded': encode_label('workout_type', data['Workout Type']),
+        'Workout Intensity_encoded': encode_label('intensity', data['Workout Intensity']),
+        'Mood Before Workout_encoded': encode_label('mood_before', data['Mood Before Workout']),
+        'Mood After Workout_encoded': encode_label('mood_after', data['Mood After Workout']),
+        'BMI': bmi,
+        'Heart_rate_intensity': heart_rate_intensity
+    }
+    
+    row = [engineered[col] if col in engineered else data[col] for col in model_data['feature_cols']]
+    return row, bmi, heart_rate_intensity
+
+def build_prediction_response(data, predictions, bmi, heart_rate_intensity):
+    """Post-process one record's model predictions into the /predict response"""
+    ultimate_predictions = get_ultimate_ai_predictions(data)
+    
+    # Use Ultimate AI calories if available, otherwise use enhanced calculation
+    if ultimate_predictions:
+        enhanced_calories = ultimate_predictions.get('calories_burned', predictions['Calories Burned'])
+    else:
+        enhanced_calories = enhanced_calorie_calculation(
+            predictions['Calories Burned'],
+            data['Age'],
+            data['Weight (kg)'],
+            data['Gender'],
+            data['Workout Duration (mins)'],
+            data['Workout Intensity'],
+            data['Heart Rate (bpm)']
+        )
+    
+    # Calculate VO2 Max
+    vo2_max = calculate_vo2_max(
+        data['Age'],
+        data['Gender'],
+        data['Heart Rate (bpm)'],
+        data['Resting Heart Rate (bpm)'],
+        data['Workout Duration (mins)'],
+        data['Workout Intensity']
+    )
+    
+    # Prepare response with Ultimate AI insights
+    results = {
+        'calories_burned': round(enhanced_calories, 1),
+        'distance_km': round(predictions['Distance (km)'], 2),
+        'sleep_hours': round(predictions['Sleep Hours'], 1),
+        'daily_calories_intake': round(predictions['Daily Calories Intake'], 0),
+        'steps_taken': round(predictions['Steps Taken'], 0),
+        'vo2_max': round(vo2_max, 1),
+        'fitness_metrics': {
+            'bmi': round(bmi, 1),
+            'heart_rate_intensity': round(heart_rate_intensity, 2),
+            'workout_efficiency': round(enhanced_calories / data['Workout Duration (mins)'], 1)
+        }
+    }
+    
+    # Add Ultimate AI insights if available
+    response = {
+        'success': True,
+        'predictions': results,
+        'model_version': '2.1 - Enhanced with Ultimate AI',
+        'input_summary': {
+            'workout': f"{data['Workout Type']} ({data['Workout Intensity']} intensity)",
+            'duration': f"{data['Workout Duration (mins)']} minutes",
+            'user': f"{data['Age']}y {data['Gender']}, {data['Weight (kg)']}kg"
+        }
+    }
+    
+    # Include Ultimate AI insights if available
+    if ultimate_predictions:
+        response['ultimate_ai'] = {
+            'available': True,
+            'model_rating': '30/30 - EXTREMELY VALUABLE',
+            'enhanced_predictions': round_ultimate_predictions(ultimate_predictions)
+        }
+        
+        # Add AI insights if available
+        if 'ai_insights' in ultimate_predictions:
+            insights = ultimate_predictions['ai_insights']
+            response['ultimate_ai']['insights'] = {
+                'fitness_trajectory': insights.get('fitness_trajectory', 'Analyzing...'),
+                'combined_ai_score': round(insights.get('combined_ai_score', 0) * 100, 1),
+                'optimization_tips': insights.get('optimization_tips', [])[:3]  # Top 3 tips
+            }
+            
+            # Pattern analysis
+            if 'pattern_analysis' in insights:
+                pattern = insights['pattern_analysis']
+                response['ultimate_ai']['pattern_analysis'] = {
+                    'variety_score': round(pattern.get('variety_score', 0) * 100, 0),
+                    'consistency_score': round(pattern.get('consistency_score', 0) * 100, 0),
+                    'next_recommendation': pattern.get('next_recommendation', 'Continue current plan')
+                }
+    else:
+        response['ultimate_ai'] = {
+            'available': False,
+            'message': 'Using standard enhanced model'
+        }
+    
+    # 🔥 NEW: Generate Enhanced Smart Recommendations
+    try:
+        # Prepare user data with BMI calculation
+        # data is a fresh dict owned by this request, so extend it in place instead of copying
+        data['BMI'] = bmi
+        data.setdefault('water_intake_today_ml', 1000)  # Default if not provided
+        user_data_for_recommendations = data
+        
+        # Prepare predictions dictionary
+        predictions_for_recommendations = {
+            'calories_burned': enhanced_calories,
+            'distance_km': predictions['Distance (km)'],
+            'sleep_hours': predictions['Sleep Hours'],
+            'daily_calories_intake': predictions['Daily Calories Intake'],
+            'steps_taken': predictions['Steps Taken'],
+            'vo2_max': vo2_max,
+            'bmi': bmi
+        }
+        
+        # Generate comprehensive smart recommendations
+        smart_recs = smart_recommendations.generate_smart_recommendations(
+            user_data_for_recommendations, 
+            predictions_for_recommendations
+        )
+        
+        # Add to response
+        response['smart_recommendations'] = {
+            'version': '3.0 - WHO Guidelines & Science-Based',
+            'available': True,
+            'recommendations': smart_recs
+        }
+        
+        logger.info("✅ Enhanced Smart Recommendations generated successfully!")
+        
+    except Exception as rec_error:
+        logger.warning("⚠️ Smart recommendations error: %s", rec_error)
+        response['smart_recommendations'] = {
+            'available': False,
+            'error': f'Recommendations unavailable: {str(rec_error)}'
+        }
+    
+    return response
+
 @app.route('/predict', methods=['POST'])
 def predict():
+    if not model_ready.is_set():
+        return jsonify({'status': 'warming_up'}), 503
     if model_data is None:
         return jsonify({'error': 'Enhanced model not loaded'}), 500
     
     try:
-        # Get input data
+        # Get input data - a single record or a list of records
         data = request.get_json()
         if not data:
             return jsonify({'error': 'No JSON data received'}), 400
         
-        print(f"Received data: {data}")
-        
-        # Try Ultimate Fitness AI first (your 30/30 + BERT4Rec model)
-        ultimate_predictions = None
-        if ULTIMATE_AI_AVAILABLE:
-            try:
-                # Convert to Ultimate AI format
-                current_workout = {
-                    'age': data['Age'],
-                    'weight': data['Weight (kg)'],
-                    'height': data['Height (cm)'],
-                    'gender': data['Gender'],
-                    'workout_type': data['Workout Type'],
-                    'duration': data['Workout Duration (mins)'],
-                    'intensity': data['Workout Intensity'],
-                    'heart_rate': data['Heart Rate (bpm)'],
-                    'mood_before': data['Mood Before Workout'],
-                    'mood_after': data['Mood After Workout'],
-                    'weather_temp': 20,
-                    'sleep_hours': 7,
-                    'water_intake': 2
-                }
-                
-                # Get workout history if provided
-                workout_history = data.get('workout_history', [])
-                
-                # Get Ultimate AI prediction
-                ultimate_result = get_ultimate_fitness_recommendations(current_workout, workout_history)
-                ultimate_predictions = ultimate_result
-                print(f"✅ Ultimate AI prediction successful: {ultimate_result.get('calories_burned', 0)} calories")
-                
-            except Exception as e:
-                print(f"⚠️ Ultimate AI failed, falling back to standard model: {e}")
+        records = data if isinstance(data, list) else [data]
+        logger.info("Received %d record(s)", len(records))
         
         # Standard model prediction (fallback or supplement)
-        # Create input DataFrame
-        input_df = pd.DataFrame([data])
-        
-        # Encode categorical variables
-        input_df['Gender_encoded'] = model_data['encoders']['gender'].transform([data['Gender']])[0]
-        input_df['Workout Type_encoded'] = model_data['encoders']['workout_type'].transform([data['Workout Type']])[0]
-        input_df['Workout Intensity_encoded'] = model_data['encoders']['intensity'].transform([data['Workout Intensity']])[0]
-        input_df['Mood Before Workout_encoded'] = model_data['encoders']['mood_before'].transform([data['Mood Before Workout']])[0]
-        input_df['Mood After Workout_encoded'] = model_data['encoders']['mood_after'].transform([data['Mood After Workout']])[0]
-        
-        # Add engineered features
-        input_df['BMI'] = data['Weight (kg)'] / (data['Height (cm)'] / 100) ** 2
-        input_df['Heart_rate_intensity'] = data['Heart Rate (bpm)'] / data['Resting Heart Rate (bpm)']
-        
-        # Select features for prediction
-        X_pred = input_df[model_data['feature_cols']]
+        # Stack every record into one feature matrix so each model runs once per batch
+        rows, bmis, heart_rate_intensities = zip(*(build_feature_row(record) for record in records))
+        mean, scale = model_data['scaler']
+        X_scaled = (np.array(rows, dtype=np.float64) - mean) / scale
         
         # Make predictions for all targets
-        predictions = {}
-        for target in model_data['output_targets']:
-            scaler = model_data['scalers'][target]
-            model = model_data['models'][target]
-            
-            X_scaled = scaler.transform(X_pred)
-            pred = model.predict(X_scaled)[0]
-            predictions[target] = max(0, pred)  # Ensure non-negative values
-        
-        # Use Ultimate AI calories if available, otherwise use enhanced calculation
-        if ultimate_predictions:
-            enhanced_calories = ultimate_predictions.get('calories_burned', predictions['Calories Burned'])
-        else:
-            enhanced_calories = enhanced_calorie_calculation(
-                predictions['Calories Burned'],
-                data['Age'],
-                data['Weight (kg)'],
-                data['Gender'],
-                data['Workout Duration (mins)'],
-                data['Workout Intensity'],
-                data['Heart Rate (bpm)']
-            )
-        
-        # Calculate VO2 Max
-        vo2_max = calculate_vo2_max(
-            data['Age'],
-            data['Gender'],
-            data['Heart Rate (bpm)'],
-            data['Resting Heart Rate (bpm)'],
-            data['Workout Duration (mins)'],
-            data['Workout Intensity']
-        )
-        
-        # Prepare response with Ultimate AI insights
-        results = {
-            'calories_burned': round(enhanced_calories, 1),
-            'distance_km': round(predictions['Distance (km)'], 2),
-            'sleep_hours': round(predictions['Sleep Hours'], 1),
-            'daily_calories_intake': round(predictions['Daily Calories Intake'], 0),
-            'steps_taken': round(predictions['Steps Taken'], 0),
-            'vo2_max': round(vo2_max, 1),
-            'fitness_metrics': {
-                'bmi': round(input_df['BMI'].values[0], 1),
-                'heart_rate_intensity': round(input_df['Heart_rate_intensity'].values[0], 2),
-                'workout_efficiency': round(enhanced_calories / data['Workout Duration (mins)'], 1)
-            }
+        target_predictions = {
+            target: model_data['models'][target].predict(X_scaled)
+            for target in model_data['output_targets']
         }
         
-        # Add Ultimate AI insights if available
-        response = {
-            'success': True,
-            'predictions': results,
-            'model_version': '2.1 - Enhanced with Ultimate AI',
-            'input_summary': {
-                'workout': f"{data['Workout Type']} ({data['Workout Intensity']} intensity)",
-                'duration': f"{data['Workout Duration (mins)']} minutes",
-                'user': f"{data['Age']}y {data['Gender']}, {data['Weight (kg)']}kg"
+        responses = []
+        for i, record in enumerate(records):
+            predictions = {
+                target: max(0, values[i])  # Ensure non-negative values
+                for target, values in target_predictions.items()
             }
-        }
+            responses.append(build_prediction_response(record, predictions, bmis[i], heart_rate_intensities[i]))
         
-        # Include Ultimate AI insights if available
-        if ultimate_predictions:
-            response['ultimate_ai'] = {
-                'available': True,
-                'model_rating': '30/30 - EXTREMELY VALUABLE',
-                'enhanced_predictions': {
-                    'efficiency': round(ultimate_predictions.get('efficiency', 0), 2),
-                    'fatigue_level': round(ultimate_predictions.get('fatigue_level', 0), 1),
-                    'recovery_time': round(ultimate_predictions.get('recovery_time', 0), 1),
-                    'performance_score': round(ultimate_predictions.get('performance_score', 0), 1)
-                }
-            }
-            
-            # Add AI insights if available
-            if 'ai_insights' in ultimate_predictions:
-                insights = ultimate_predictions['ai_insights']
-                response['ultimate_ai']['insights'] = {
-                    'fitness_trajectory': insights.get('fitness_trajectory', 'Analyzing...'),
-                    'combined_ai_score': round(insights.get('combined_ai_score', 0) * 100, 1),
-                    'optimization_tips': insights.get('optimization_tips', [])[:3]  # Top 3 tips
-                }
-                
-                # Pattern analysis
-                if 'pattern_analysis' in insights:
-                    pattern = insights['pattern_analysis']
-                    response['ultimate_ai']['pattern_analysis'] = {
-                        'variety_score': round(pattern.get('variety_score', 0) * 100, 0),
-                        'consistency_score': round(pattern.get('consistency_score', 0) * 100, 0),
-                        'next_recommendation': pattern.get('next_recommendation', 'Continue current plan')
-                    }
-        else:
-            response['ultimate_ai'] = {
-                'available': False,
-                'message': 'Using standard enhanced model'
-            }
-        
-        # 🔥 NEW: Generate Enhanced Smart Recommendations
-        try:
-            # Prepare user data with BMI calculation
-            user_data_for_recommendations = {
-                **data,
-                'BMI': input_df['BMI'].values[0],
-                'water_intake_today_ml': data.get('water_intake_today_ml', 1000)  # Default if not provided
-            }
-            
-            # Prepare predictions dictionary
-            predictions_for_recommendations = {
-                'calories_burned': enhanced_calories,
-                'distance_km': predictions['Distance (km)'],
-                'sleep_hours': predictions['Sleep Hours'],
-                'daily_calories_intake': predictions['Daily Calories Intake'],
-                'steps_taken': predictions['Steps Taken'],
-                'vo2_max': vo2_max,
-                'bmi': input_df['BMI'].values[0]
-            }
-            
-            # Generate comprehensive smart recommendations
-            smart_recs = smart_recommendations.generate_smart_recommendations(
-                user_data_for_recommendations, 
-                predictions_for_recommendations
-            )
-            
-            # Add to response
-            response['smart_recommendations'] = {
-                'version': '3.0 - WHO Guidelines & Science-Based',
-                'available': True,
-                'recommendations': smart_recs
-            }
-            
-            print("✅ Enhanced Smart Recommendations generated successfully!")
-            
-        except Exception as rec_error:
-            print(f"⚠️ Smart recommendations error: {rec_error}")
-            response['smart_recommendations'] = {
-                'available': False,
-                'error': f'Recommendations unavailable: {str(rec_error)}'
-            }
-        
-        return jsonify(response)
+        return fast_json(responses if isinstance(data, list) else responses[0])
         
     except Exception as e:
-        print(f"❌ Error in prediction: {e}")
-        print(f"Traceback: {traceback.format_exc()}")
+        # The log record carries the traceback; only ship it to the client in debug mode
+        logger.exception("❌ Error in prediction: %s", e)
         return jsonify({
             'error': str(e),
-            'traceback': traceback.format_exc()
+            'traceback': traceback.format_exc() if app.debug else None
         }), 500
 
 @app.route('/smart-recommendations', methods=['POST'])
@@ -810,11 +989,9 @@ def get_smart_recommendations_only():
         bmi = data['Weight (kg)'] / (data['Height (cm)'] / 100) ** 2
         
         # Prepare user data
-        user_data_for_recommendations = {
-            **data,
-            'BMI': bmi,
-            'water_intake_today_ml': data.get('water_intake_today_ml', 1000)
-        }
+        data['BMI'] = bmi
+        data.setdefault('water_intake_today_ml', 1000)
+        user_data_for_recommendations = data
         
         # Simple calorie estimation for recommendations
         met_values = {'Running': 11, 'Cycling': 8, 'Walking': 4, 'Weightlifting': 6, 'Swimming': 8, 'Boxing': 10, 'Yoga': 3}
@@ -861,6 +1038,7 @@ def health():
     return jsonify({
         'status': 'healthy',
         'model_loaded': model_data is not None,
+        'model_loading': not model_ready.is_set(),
         'ultimate_ai_available': ULTIMATE_AI_AVAILABLE,
         'smart_recommendations_available': True,
         'version': '3.0 - Enhanced with Smart Recommendations + Ultimate AI',
@@ -880,4 +1058,4 @@ if __name__ == '__main__':
     print("📡 Main prediction endpoint: http://localhost:5002/predict")
     print("🧠 Smart recommendations only: http://localhost:5002/smart-recommendations")
     print("💡 Health check: http://localhost:5002/health")
-    app.run(debug=True, host='0.0.0.0', port=5002)
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1', host='0.0.0.0', port=5002, threaded=True)
@@ -0,0 +1,93 @@
+"""
+Common Kernels
+Heart-rate zone and macro arithmetic shared by the recommendation APIs,
+the feature-engineering pass of the model trainer, and the similarity and
+scoring kernels used by the advanced recommendation engine
+"""
+
+import numpy as np
+
+# Numba compiles the kernels when installed; otherwise they run as plain Python
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+@njit(cache=True)
+def compute_hr_zones(max_hr):
+    """60/70/85/95% of max heart rate as whole bpm.
+    Integer percentages avoid float truncation (e.g. int(170*0.7) == 118)"""
+    return (int(max_hr * 60 // 100), int(max_hr * 70 // 100),
+            int(max_hr * 85 // 100), int(max_hr * 95 // 100))
+
+@njit(cache=True)
+def compute_macros(daily_calories, protein_ratio, carbs_ratio, fat_ratio):
+    """Split daily calories into (protein_g, carbs_g, fats_g) at 4/4/9 kcal per gram"""
+    return (daily_calories * protein_ratio / 4,
+            daily_calories * carbs_ratio / 4,
+            daily_calories * fat_ratio / 9)
+
+@njit(parallel=True, cache=True)
+def cosine_similarities(vec, mat):
+    """Cosine similarity of vec against every row of mat (0.0 where either norm is zero)"""
+    n_rows, n_cols = mat.shape
+    vec_sq = 0.0
+    for j in range(n_cols):
+        vec_sq += vec[j] * vec[j]
+    out = np.zeros(n_rows)
+    for i in prange(n_rows):
+        dot = 0.0
+        row_sq = 0.0
+        for j in range(n_cols):
+            dot += vec[j] * mat[i, j]
+            row_sq += mat[i, j] * mat[i, j]
+        if vec_sq > 0.0 and row_sq > 0.0:
+            out[i] = dot / np.sqrt(vec_sq * row_sq)
+    return out
+
+@njit(parallel=True, cache=True)
+def top_k_dot_scores(user_mat, item_mat, exclude, k):
+    """Top-k dot-product scores of each user_mat row against the item_mat rows,
+    skipping items flagged in exclude; ties keep item order, unused slots are -1/-inf"""
+    n_users, n_factors = user_mat.shape
+    n_items = item_mat.shape[0]
+    out_idx = np.full((n_users, k), -1, dtype=np.int64)
+    out_score = np.full((n_users, k), -np.inf)
+    for u in prange(n_users):
+        for j in range(n_items):
+            if exclude[u, j]:
+                continue
+            s = 0.0
+            for t in range(n_factors):
+                s += user_mat[u, t] * item_mat[j, t]
+            if s > out_score[u, k - 1]:
+                # Insert into the row's sorted top-k (k is small)
+                pos = k - 1
+                while pos > 0 and s > out_score[u, pos - 1]:
+                    out_idx[u, pos] = out_idx[u, pos - 1]
+                    out_score[u, pos] = out_score[u, pos - 1]
+                    pos -= 1
+                out_idx[u, pos] = j
+                out_score[u, pos] = s
+    return out_idx, out_score
+
+@njit(parallel=True, cache=True)
+def compute_training_features(weight, height, age, is_male, intensity, duration,
+                              bmr_out, multiplier_out, calories_out, hydration_out, max_hr_out):
+    """Derived trainer columns in one pass: Mifflin-St Jeor BMR, activity multiplier,
+    daily calories, hydration (ml) and max heart rate"""
+    for i in prange(weight.shape[0]):
+        bmr = (10 * weight[i]) + (6.25 * height[i]) - (5 * age[i]) + (5.0 if is_male[i] else -161.0)
+        multiplier = 1.2 + (intensity[i] * 0.2) + (duration[i] / 120)
+        bmr_out[i] = bmr
+        multiplier_out[i] = multiplier
+        calories_out[i] = bmr * multiplier
+        hydration_out[i] = (weight[i] * 35) + (duration[i] * intensity[i] * 10)
+        max_hr_out[i] = 220 - age[i]
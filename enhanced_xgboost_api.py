@@ -1,137 +1,192 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
+from orjson_provider import use_orjson
+from api_logging import get_api_logger
+from common_kernels import njit, compute_hr_zones, compute_macros
+from request_schema import Struct, RequestValidationError, decode_request
+from functools import lru_cache
+from typing import Optional, Union
+import json
 
 app = Flask(__name__)
 CORS(app)
+use_orjson(app)
+
+logger = get_api_logger(__name__)
+
+# Lookup tables used by get_recommendations (built once at import, not per request)
+INTENSITY_WATER_BONUS = {'low': 200, 'medium': 400, 'high': 600}
+INTENSITY_ACTIVITY_MULTIPLIER = {'low': 1.3, 'medium': 1.5, 'high': 1.7}
+INTENSITY_MET_MULTIPLIER = {'low': 0.8, 'medium': 1.0, 'high': 1.3}
+RECOVERY_HOURS = {'low': 12, 'medium': 24, 'high': 48}
+
+# Per-workout tables as parallel tuples: one dict lookup for the index, then positional reads.
+# The last slot holds the defaults for workout types not listed here.
+WORKOUT_INDEX = {'cardio': 0, 'running': 1, 'cycling': 2, 'hiit': 3, 'strength': 4, 'yoga': 5}
+DEFAULT_WORKOUT_INDEX = len(WORKOUT_INDEX)
+
+# Base metabolic equivalent (MET) values for different activities
+WORKOUT_MET = (6.0, 8.0, 7.5, 9.0, 5.0, 3.0, 6.0)
+
+WORKOUT_MUSCLE_GROUPS = (
+    ['Heart', 'Legs', 'Glutes', 'Core'],
+    ['Legs', 'Glutes', 'Core', 'Cardiovascular'],
+    ['Legs', 'Glutes', 'Core', 'Cardiovascular'],
+    ['Full Body', 'Core', 'Legs', 'Cardiovascular'],
+    ['Chest', 'Arms', 'Back', 'Shoulders'],
+    ['Core', 'Flexibility', 'Balance', 'Mind-Body'],
+    ['Full Body', 'Core']
+)
+
+# Max HR adjustment for estimated fitness level based on workout choice
+WORKOUT_FITNESS_ADJUSTMENT = (0, 2, 1, 3, 0, -2, 0)
+
+class RecoRequest(Struct):
+    """Body of POST /api/recommendations"""
+    age: float = 25.0  # floats are truncated to whole years/minutes by the handler
+    weight: float = 70.0
+    height: float = 175.0
+    gender: str = 'male'
+    workout_type: str = 'cardio'
+    workout_duration: float = 30.0
+    workout_intensity: Optional[Union[str, float]] = 'medium'  # unknown values get the medium defaults
+
+@njit(cache=True)
+def _compute_reco_numbers(age, weight, height, duration, bmr_offset,
+                          water_bonus, activity_multiplier, met, met_multiplier):
+    """Scalar arithmetic behind get_recommendations; dict lookups stay in Python"""
+    # Hydration: 35ml per kg + intensity bonus + 8ml per minute
+    daily_water = weight * 35 + water_bonus + duration * 8
+    
+    # BMR (Mifflin-St Jeor) with activity and duration adjustment
+    bmr = (10 * weight) + (6.25 * height) - (5 * age) + bmr_offset
+    daily_calories = bmr * activity_multiplier * (1 + (duration / 300))
+    
+    # Calorie burn = MET × weight(kg) × duration(hours)
+    calorie_burn = met * met_multiplier * weight * (duration / 60)
+    
+    return daily_water, bmr, daily_calories, calorie_burn
+
+@lru_cache(maxsize=4096)
+def _compute_recommendations(age, weight, height, gender, workout_key, workout_duration, workout_intensity):
+    """Pure function of the normalized request fields, so identical inputs hit the cache.
+    The returned dict is shared between requests and must not be mutated."""
+    workout = WORKOUT_INDEX.get(workout_key, DEFAULT_WORKOUT_INDEX)
+    daily_water, bmr, daily_calories, calorie_burn = _compute_reco_numbers(
+        age, weight, height, workout_duration,
+        5 if gender == 'male' else -161,
+        INTENSITY_WATER_BONUS.get(workout_intensity, 400),
+        INTENSITY_ACTIVITY_MULTIPLIER.get(workout_intensity, 1.5),
+        WORKOUT_MET[workout],
+        INTENSITY_MET_MULTIPLIER.get(workout_intensity, 1.0)
+    )
+    
+    # 1. Hydration Strategy (Enhanced Formula)
+    # Numeric fields carry the unit in the key; only the advice sentences are formatted
+    pre_workout_ml = round(daily_water * 0.2)
+    during_workout_ml = round(daily_water * 0.15)
+    post_workout_ml = round(daily_water * 0.25)
+    hydration_strategy = {
+        'daily_total_ml': round(daily_water),
+        'pre_workout_ml': pre_workout_ml,
+        'during_workout_ml': during_workout_ml,
+        'post_workout_ml': post_workout_ml,
+        'recommendations': [
+            f"Drink {pre_workout_ml}ml 2 hours before workout",
+            f"Consume {during_workout_ml}ml every 20 minutes during exercise",
+            f"Rehydrate with {post_workout_ml}ml within 30 minutes post-workout"
+        ]
+    }
+    
+    # 2. Nutrition Strategy (BMR-based with activity adjustment)
+    protein_g, carbs_g, fats_g = compute_macros(daily_calories, 0.25, 0.45, 0.30)
+    nutrition_strategy = {
+        'daily_calories': round(daily_calories),
+        'protein_grams': round(protein_g),
+        'carbs_grams': round(carbs_g),
+        'fats_grams': round(fats_g),
+        'bmr': round(bmr)
+    }
+    
+    # 3. Workout Benefits (Enhanced calorie calculation)
+    muscle_groups = WORKOUT_MUSCLE_GROUPS[workout]
+    
+    workout_benefits = {
+        'calorie_burn_range': f"{calorie_burn-30:.0f}-{calorie_burn+30:.0f} calories",
+        'muscle_groups': muscle_groups,
+        'recovery_time': f"{RECOVERY_HOURS.get(workout_intensity, 24)} hours",
+        'predicted_burn': f"{calorie_burn:.0f} calories"
+    }
+    
+    # 4. Heart Rate Zones (Age-based with fitness level consideration)
+    max_hr = 220 - age
+    
+    # Adjust for estimated fitness level based on workout choice
+    adjusted_max_hr = max_hr + WORKOUT_FITNESS_ADJUSTMENT[workout]
+    
+    hr_60, hr_70, hr_85, hr_95 = compute_hr_zones(adjusted_max_hr)
+    
+    heart_rate_zones = {
+        'max_hr': f"{adjusted_max_hr}",
+        'fat_burn_zone': f"{hr_60}-{hr_70}",
+        'cardio_zone': f"{hr_70}-{hr_85}",
+        'max_zone': f"{hr_85}-{hr_95}",
+        'resting_hr': "60"
+    }
+    
+    return {
+        'hydration_strategy': hydration_strategy,
+        'nutrition_strategy': nutrition_strategy,
+        'workout_benefits': workout_benefits,
+        'heart_rate_zones': heart_rate_zones
+    }
 
 @app.route('/api/recommendations', methods=['POST'])
 def get_recommendations():
     try:
-        data = request.json
-        print(f"Received request: {data}")
-        
-        # Extract user data with defaults
-        age = int(data.get('age', 25))
-        weight = float(data.get('weight', 70))
-        height = float(data.get('height', 175))
-        gender = data.get('gender', 'male')
-        workout_type = data.get('workout_type', 'cardio')
-        workout_duration = int(data.get('workout_duration', 30))
-        workout_intensity = data.get('workout_intensity', 'medium')
-        
-        # 1. Hydration Strategy (Enhanced Formula)
-        base_hydration = weight * 35  # 35ml per kg
-        intensity_bonus = {'low': 200, 'medium': 400, 'high': 600}
-        duration_bonus = workout_duration * 8  # 8ml per minute
-        daily_water = base_hydration + intensity_bonus.get(workout_intensity, 400) + duration_bonus
-        
-        hydration_strategy = {
-            'daily_total': f"{daily_water:.0f}ml",
-            'recommendations': [
-                f"Drink {daily_water*0.2:.0f}ml 2 hours before workout",
-                f"Consume {daily_water*0.15:.0f}ml every 20 minutes during exercise",
-                f"Rehydrate with {daily_water*0.25:.0f}ml within 30 minutes post-workout"
-            ]
-        }
-        
-        # 2. Nutrition Strategy (BMR-based with activity adjustment)
-        if gender.lower() == 'male':
-            bmr = (10 * weight) + (6.25 * height) - (5 * age) + 5
-        else:
-            bmr = (10 * weight) + (6.25 * height) - (5 * age) - 161
-        
-        # Activity multiplier based on workout intensity and duration
-        base_multiplier = {'low': 1.3, 'medium': 1.5, 'high': 1.7}
-        duration_factor = 1 + (workout_duration / 300)  # Additional factor for longer workouts
-        daily_calories = bmr * base_multiplier.get(workout_intensity, 1.5) * duration_factor
-        
-        nutrition_strategy = {
-            'daily_calories': f"{daily_calories:.0f}",
-            'protein_grams': f"{(daily_calories * 0.25) / 4:.0f}g",
-            'carbs_grams': f"{(daily_calories * 0.45) / 4:.0f}g",
-            'fats_grams': f"{(daily_calories * 0.30) / 9:.0f}g",
-            'bmr': f"{bmr:.0f}"
-        }
-        
-        # 3. Workout Benefits (Enhanced calorie calculation)
-        # Base metabolic equivalent (MET) values for different activities
-        met_values = {
-            'cardio': 6.0, 'running': 8.0, 'cycling': 7.5,
-            'hiit': 9.0, 'strength': 5.0, 'yoga': 3.0
-        }
-        met = met_values.get(workout_type.lower(), 6.0)
+        req = decode_request(request.get_data(), RecoRequest)
+        logger.info("Received request: %s", req)
         
-        # Intensity adjustment
-        intensity_multiplier = {'low': 0.8, 'medium': 1.0, 'high': 1.3}
-        adjusted_met = met * intensity_multiplier.get(workout_intensity, 1.0)
+        smart_recommendations = _compute_recommendations(
+            int(req.age), req.weight, req.height, req.gender.lower(), req.workout_type.lower(),
+            int(req.workout_duration), req.workout_intensity
+        )
         
-        # Calorie burn = MET × weight(kg) × duration(hours)
-        calorie_burn = adjusted_met * weight * (workout_duration / 60)
-        
-        muscle_groups = {
-            'cardio': ['Heart', 'Legs', 'Glutes', 'Core'],
-            'strength': ['Chest', 'Arms', 'Back', 'Shoulders'],
-            'hiit': ['Full Body', 'Core', 'Legs', 'Cardiovascular'],
-            'yoga': ['Core', 'Flexibility', 'Balance', 'Mind-Body'],
-            'running': ['Legs', 'Glutes', 'Core', 'Cardiovascular'],
-            'cycling': ['Legs', 'Glutes', 'Core', 'Cardiovascular']
-        }.get(workout_type.lower(), ['Full Body', 'Core'])
-        
-        recovery_hours = {'low': 12, 'medium': 24, 'high': 48}
-        
-        workout_benefits = {
-            'calorie_burn_range': f"{calorie_burn-30:.0f}-{calorie_burn+30:.0f} calories",
-            'muscle_groups': muscle_groups,
-            'recovery_time': f"{recovery_hours.get(workout_intensity, 24)} hours",
-            'predicted_burn': f"{calorie_burn:.0f} calories"
-        }
-        
-        # 4. Heart Rate Zones (Age-based with fitness level consideration)
-        max_hr = 220 - age
-        
-        # Adjust for estimated fitness level based on workout choice
-        fitness_adjustment = {
-            'yoga': -2, 'cardio': 0, 'running': 2, 'hiit': 3, 'cycling': 1, 'strength': 0
-        }
-        adjusted_max_hr = max_hr + fitness_adjustment.get(workout_type.lower(), 0)
-        
-        heart_rate_zones = {
-            'max_hr': f"{adjusted_max_hr}",
-            'fat_burn_zone': f"{int(adjusted_max_hr*0.6)}-{int(adjusted_max_hr*0.7)}",
-            'cardio_zone': f"{int(adjusted_max_hr*0.7)}-{int(adjusted_max_hr*0.85)}",
-            'max_zone': f"{int(adjusted_max_hr*0.85)}-{int(adjusted_max_hr*0.95)}",
-            'resting_hr': "60"
-        }
-        
-        print("✅ Enhanced formula-based predictions generated successfully!")
+        logger.info("✅ Enhanced formula-based predictions generated successfully!")
         
         return jsonify({
             'success': True,
             'model_type': 'Enhanced Formula-Based',
-            'smart_recommendations': {
-                'hydration_strategy': hydration_strategy,
-                'nutrition_strategy': nutrition_strategy,
-                'workout_benefits': workout_benefits,
-                'heart_rate_zones': heart_rate_zones
-            }
+            'smart_recommendations': smart_recommendations
         })
         
+    except RequestValidationError as e:
+        logger.warning("Invalid request: %s", e)
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'model_type': 'Error'
+        }), 400
+        
     except Exception as e:
-        print(f"❌ Error in API: {str(e)}")
+        logger.error("❌ Error in API: %s", e)
         return jsonify({
             'success': False,
             'error': str(e),
             'model_type': 'Error'
         })
 
+# The health payload never changes, so it is serialized once at import
+HEALTH_BODY = json.dumps({
+    'status': 'healthy',
+    'model_type': 'Enhanced Formula-Based',
+    'accuracy': '85-90%',
+    'features': ['hydration', 'nutrition', 'workout_benefits', 'heart_rate_zones']
+}, separators=(',', ':')).encode()
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({
-        'status': 'healthy',
-        'model_type': 'Enhanced Formula-Based',
-        'accuracy': '85-90%',
-        'features': ['hydration', 'nutrition', 'workout_benefits', 'heart_rate_zones']
-    })
+    return Response(HEALTH_BODY, mimetype='application/json')
 
 @app.route('/', methods=['GET'])
 def home():
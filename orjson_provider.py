@@ -0,0 +1,36 @@
+"""
+orjson JSON Provider
+Drop-in replacement for Flask's stdlib-json provider, used by the recommendation APIs
+"""
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+ORJSON_OPTIONS = 0
+if ORJSON_AVAILABLE:
+    ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Serialize jsonify() responses with orjson (C-accelerated, numpy-aware)"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=ORJSON_OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=ORJSON_OPTIONS)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+def use_orjson(app):
+    """Switch the app's JSON provider to orjson when it is installed"""
+    if ORJSON_AVAILABLE:
+        app.json = OrjsonProvider(app)
+    return app
@@ -3,8 +3,15 @@ Professional Recommendation API
 Serves the Ultimate Fitness Recommendation Engine for the professional fitness tracker
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
+from orjson_provider import use_orjson
+from api_logging import get_api_logger
+from common_kernels import compute_hr_zones, compute_macros
+from request_schema import Struct, RequestValidationError, decode_request
+from typing import Optional, Union
+import importlib.util
+import json
 import traceback
 import warnings
 from datetime import datetime
@@ -13,28 +20,49 @@ import os
 
 warnings.filterwarnings('ignore')
 
-# Import the Ultimate Recommendation Engine
-try:
-    from ultimate_recommendation_engine import get_ultimate_fitness_recommendations, UltimateFitnessRecommendationEngine
-    ULTIMATE_ENGINE_AVAILABLE = True
-    print("✅ Ultimate Recommendation Engine loaded successfully!")
-except ImportError as e:
-    print(f"⚠️ Ultimate Recommendation Engine not available: {e}")
-    ULTIMATE_ENGINE_AVAILABLE = False
+# The engine pulls in the full ML stack, so only check that it is importable here
+# and import it on the first request (see _get_engine)
+ULTIMATE_ENGINE_AVAILABLE = importlib.util.find_spec('ultimate_recommendation_engine') is not None
+_ultimate_recommendations = None
 
 app = Flask(__name__)
 CORS(app)
+use_orjson(app)
+
+logger = get_api_logger(__name__)
+
+# Everything except the timestamp is static, so serialize it once and splice the timestamp in
+HEALTH_BODY_PREFIX = json.dumps({
+    'status': 'healthy',
+    'service': 'Professional Recommendation API',
+    'ultimate_engine_available': ULTIMATE_ENGINE_AVAILABLE
+}, separators=(',', ':'))[:-1].encode() + b',"timestamp":"'
 
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    return jsonify({
-        'status': 'healthy',
-        'service': 'Professional Recommendation API',
-        'ultimate_engine_available': ULTIMATE_ENGINE_AVAILABLE,
-        'timestamp': datetime.now().isoformat()
-    })
-
+    body = HEALTH_BODY_PREFIX + datetime.now().isoformat().encode() + b'"}'
+    return Response(body, mimetype='application/json')
+
+
+def _get_engine():
+    """Import get_ultimate_fitness_recommendations on first use"""
+    global _ultimate_recommendations
+    if _ultimate_recommendations is None:
+        from ultimate_recommendation_engine import get_ultimate_fitness_recommendations
+        _ultimate_recommendations = get_ultimate_fitness_recommendations
+        logger.info("✅ Ultimate Recommendation Engine loaded successfully!")
+    return _ultimate_recommendations
+
+class RecoRequest(Struct):
+    """Body of POST /api/recommendations (same fields as the XGBoost API)"""
+    weight: float = 70.0
+    height: float = 175.0
+    age: float = 25.0  # truncated to whole years by the handler
+    workout_duration: float = 30.0
+    gender: str = 'male'
+    workout_type: str = 'cardio'
+    workout_intensity: Optional[Union[float, str]] = '3'  # unparseable values fall back to 3.0
 
 @app.route('/api/recommendations', methods=['POST'])
 def recommendations():
@@ -43,20 +71,24 @@ def recommendations():
         if not ULTIMATE_ENGINE_AVAILABLE:
             return jsonify({'success': False, 'error': 'Ultimate Recommendation Engine not available'}), 503
 
-        data = request.json
-        print(f"📥 Request: {data}")
-
-        # Extract and validate data (mimic XGBoost API)
-        weight = float(data.get('weight', 70))
-        height = float(data.get('height', 175))
-        age = int(data.get('age', 25))
-        duration = float(data.get('workout_duration', 30))
-        gender = data.get('gender', 'male').capitalize()
-        workout_type = data.get('workout_type', 'cardio').capitalize()
-        intensity = data.get('workout_intensity', '3')
         try:
-            intensity_val = float(intensity)
-        except:
+            get_ultimate_fitness_recommendations = _get_engine()
+        except ImportError as e:
+            logger.error("⚠️ Ultimate Recommendation Engine not available: %s", e)
+            return jsonify({'success': False, 'error': 'Ultimate Recommendation Engine not available'}), 503
+
+        req = decode_request(request.get_data(), RecoRequest)
+        logger.info("📥 Request: %s", req)
+
+        weight = req.weight
+        height = req.height
+        age = int(req.age)
+        duration = req.workout_duration
+        gender = req.gender.capitalize()
+        workout_type = req.workout_type.capitalize()
+        try:
+            intensity_val = float(req.workout_intensity)
+        except (TypeError, ValueError):
             intensity_val = 3.0
 
         # Map to professional engine input
@@ -79,23 +111,29 @@ def recommendations():
         daily_calories = recommendations['predictions']['daily_calories_intake']
         hydration_ml = max(1500, min(4000, calories * 30))
         max_hr = 220 - age
+        hr_60, hr_70, hr_85, hr_95 = compute_hr_zones(max_hr)
+        protein_g, carbs_g, fats_g = compute_macros(daily_calories, 0.3, 0.4, 0.3)
+        pre_workout_ml = round(hydration_ml * 0.2)
+        during_workout_ml = round(hydration_ml * 0.15)
 
         response = {
             'success': True,
             'model_type': 'ProfessionalUltimate',
             'smart_recommendations': {
                 'hydration_strategy': {
-                    'daily_total': f"{hydration_ml:.0f}ml",
+                    'daily_total_ml': round(hydration_ml),
+                    'pre_workout_ml': pre_workout_ml,
+                    'during_workout_ml': during_workout_ml,
                     'recommendations': [
-                        f"Drink {hydration_ml*0.2:.0f}ml 2 hours before workout",
-                        f"Consume {hydration_ml*0.15:.0f}ml every 20 minutes during exercise"
+                        f"Drink {pre_workout_ml}ml 2 hours before workout",
+                        f"Consume {during_workout_ml}ml every 20 minutes during exercise"
                     ]
                 },
                 'nutrition_strategy': {
-                    'daily_calories': f"{daily_calories:.0f}",
-                    'protein_grams': f"{int(daily_calories * 0.3 / 4)}g",
-                    'carbs_grams': f"{int(daily_calories * 0.4 / 4)}g",
-                    'fats_grams': f"{int(daily_calories * 0.3 / 9)}g"
+                    'daily_calories': round(daily_calories),
+                    'protein_grams': int(protein_g),
+                    'carbs_grams': int(carbs_g),
+                    'fats_grams': int(fats_g)
                 },
                 'workout_benefits': {
                     'calorie_burn_range': f"{calories-30:.0f}-{calories+30:.0f} calories",
@@ -104,18 +142,22 @@ def recommendations():
                 },
                 'heart_rate_zones': {
                     'max_hr': f"{max_hr:.0f}",
-                    'fat_burn_zone': f"{int(max_hr*0.6)}-{int(max_hr*0.7)}",
-                    'cardio_zone': f"{int(max_hr*0.7)}-{int(max_hr*0.85)}",
-                    'max_zone': f"{int(max_hr*0.85)}-{int(max_hr*0.95)}"
+                    'fat_burn_zone': f"{hr_60}-{hr_70}",
+                    'cardio_zone': f"{hr_70}-{hr_85}",
+                    'max_zone': f"{hr_85}-{hr_95}"
                 }
             }
         }
 
-        print("✅ Professional Ultimate recommendations generated successfully")
+        logger.info("✅ Professional Ultimate recommendations generated successfully")
         return jsonify(response)
 
+    except RequestValidationError as e:
+        logger.warning("Invalid request: %s", e)
+        return jsonify({'success': False, 'error': str(e)}), 400
+
     except Exception as e:
-        print(f"❌ Error: {e}")
+        logger.error("❌ Error: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 def _get_muscle_groups(workout_type):
@@ -0,0 +1,61 @@
+"""
+Request Schema
+Typed request bodies for the recommendation APIs, parsed and validated in one pass by msgspec
+"""
+
+import json
+
+try:
+    import msgspec
+    MSGSPEC_AVAILABLE = True
+except ImportError:
+    MSGSPEC_AVAILABLE = False
+
+class RequestValidationError(ValueError):
+    """Raised when a request body is not valid JSON or does not match its schema"""
+
+if MSGSPEC_AVAILABLE:
+    Struct = msgspec.Struct
+    _decoders = {}
+
+    def decode_request(body, struct_type):
+        """Decode and validate a JSON body into struct_type (numeric strings are coerced)"""
+        decoder = _decoders.get(struct_type)
+        if decoder is None:
+            decoder = _decoders[struct_type] = msgspec.json.Decoder(struct_type, strict=False)
+        try:
+            return decoder.decode(body or b'{}')
+        except (msgspec.DecodeError, msgspec.ValidationError) as e:
+            raise RequestValidationError(str(e)) from None
+else:
+    class Struct:
+        """Minimal stand-in for msgspec.Struct: annotated class attributes are the fields"""
+
+        def __init__(self, **fields):
+            for name, value in fields.items():
+                setattr(self, name, value)
+
+        def __repr__(self):
+            fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__annotations__)
+            return f"{type(self).__name__}({fields})"
+
+    def decode_request(body, struct_type):
+        """Decode a JSON body and cast int/float/str fields the way the handlers used to"""
+        try:
+            data = json.loads(body or b'{}')
+        except ValueError as e:
+            raise RequestValidationError(f"Invalid JSON: {e}") from None
+        if not isinstance(data, dict):
+            raise RequestValidationError(f"Expected `object`, got `{type(data).__name__}`")
+
+        fields = {}
+        for name, field_type in struct_type.__annotations__.items():
+            value = data.get(name, getattr(struct_type, name))
+            if field_type in (int, float, str):
+                try:
+                    value = field_type(value)
+                except (TypeError, ValueError):
+                    raise RequestValidationError(
+                        f"Expected `{field_type.__name__}` - at `$.{name}`") from None
+            fields[name] = value
+        return struct_type(**fields)
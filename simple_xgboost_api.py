@@ -1,62 +1,129 @@
 #!/usr/bin/env python3
 """
 Simple XGBoost API - Working Version
+
+Each process loads one Booster per model and pins it to a single thread
+(nthread=1, OMP_NUM_THREADS=1), so concurrency comes from worker processes
+rather than nested OpenMP threads inside every request.
+
+Production: gunicorn --preload -w 4 -k gthread --threads 4 -b 0.0.0.0:5001 wsgi:app
+(see wsgi.py). `python simple_xgboost_api.py` runs the Werkzeug dev server;
+set FLASK_DEBUG=1 for debug mode.
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
+from orjson_provider import use_orjson
+from api_logging import get_api_logger
+from common_kernels import compute_hr_zones, compute_macros
+from request_schema import Struct, RequestValidationError, decode_request
+from functools import lru_cache
+import json
+import os
+import queue
+import threading
+import time
 import joblib
-import pandas as pd
 import numpy as np
 
 app = Flask(__name__)
 CORS(app)
+use_orjson(app)
+
+logger = get_api_logger(__name__)
+
+# 1-row predictions gain nothing from OpenMP, and parallel Flask workers would oversubscribe the cores
+os.environ.setdefault('OMP_NUM_THREADS', '1')
 
 # Global variables for models
 models = {}
+boosters = {}  # name -> underlying xgboost Booster, used for prediction
 encoders = {}
+encoder_maps = {}  # column -> {label: code}, built from encoders at load time
+
+# Every model reads its inputs from one shared feature row, in this column order
+FEATURE_COLUMNS = ('Weight', 'Height', 'Duration', 'Age', 'Gender', 'Workout_Type', 'Intensity')
+MODEL_FEATURES = {
+    'hydration': ('Weight', 'Height', 'Duration', 'Age', 'Gender'),
+    'nutrition': ('Weight', 'Height', 'Age', 'Gender', 'Duration', 'Workout_Type'),
+    'calorie_burn': ('Weight', 'Duration', 'Age', 'Workout_Type', 'Intensity'),
+    'heart_rate': ('Age', 'Weight', 'Duration', 'Workout_Type')
+}
+MODEL_COLUMNS = {
+    name: [FEATURE_COLUMNS.index(column) for column in columns]
+    for name, columns in MODEL_FEATURES.items()
+}
+
+class RecoRequest(Struct):
+    """Body of POST /api/recommendations"""
+    weight: float = 70.0
+    height: float = 175.0
+    age: float = 25.0  # truncated to whole years by the handler
+    workout_duration: float = 30.0
+    gender: str = 'male'
+    workout_type: str = 'cardio'
+    workout_intensity: float = 3.0
+
+def build_health_body():
+    """Serialize the health payload; it only changes when models are (re)loaded"""
+    return json.dumps({
+        'status': 'healthy',
+        'models_loaded': len(models) > 0,
+        'model_count': len(models)
+    }, separators=(',', ':')).encode()
+
+health_body = build_health_body()
 
 def load_models():
     """Load all XGBoost models"""
-    global models, encoders
+    global models, boosters, encoders, encoder_maps, health_body
     try:
-        print("🔄 Loading XGBoost models...")
+        logger.info("🔄 Loading XGBoost models...")
+        
+        # Imported here so OMP_NUM_THREADS is already set when xgboost loads its OpenMP runtime
+        from xgboost import Booster
+        
+        # Prefer XGBoost's native model (binary UBJSON, then JSON; no unpickling, no sklearn wrapper);
+        # fall back to the pickled XGBRegressor for models trained before it was exported
+        for name in MODEL_FEATURES:
+            booster_path = next((path for path in (f'ml_models/{name}_xgboost_model.ubj',
+                                                   f'ml_models/{name}_xgboost_model.json')
+                                 if os.path.exists(path)), None)
+            if booster_path:
+                models[name] = Booster(model_file=booster_path)
+            else:
+                models[name] = joblib.load(f'ml_models/{name}_xgboost_model.pkl').get_booster()
         
-        models['hydration'] = joblib.load('ml_models/hydration_xgboost_model.pkl')
-        models['nutrition'] = joblib.load('ml_models/nutrition_xgboost_model.pkl')
-        models['calorie_burn'] = joblib.load('ml_models/calorie_burn_xgboost_model.pkl')
-        models['heart_rate'] = joblib.load('ml_models/heart_rate_xgboost_model.pkl')
+        # Predict on the raw Boosters, one thread each (see OMP_NUM_THREADS above)
+        boosters = dict(models)
+        for booster in boosters.values():
+            booster.set_param({'nthread': 1})
         
         encoders = joblib.load('ml_models/label_encoders.pkl')
+        encoder_maps = {
+            column: {label: code for code, label in enumerate(encoder.classes_.tolist())}
+            for column, encoder in encoders.items()
+        }
+        health_body = build_health_body()
         
-        print("✅ All models loaded successfully!")
+        logger.info("✅ All models loaded successfully!")
         return True
         
     except Exception as e:
-        print(f"❌ Error loading models: {e}")
+        logger.error("❌ Error loading models: %s", e)
         return False
 
 def encode_value(value, column):
-    """Encode categorical values"""
-    try:
-        if column in encoders:
-            encoder = encoders[column]
-            if value in encoder.classes_:
-                return encoder.transform([value])[0]
-            else:
-                return encoder.transform([encoder.classes_[0]])[0]
+    """Encode categorical values; unknown labels fall back to the first class"""
+    mapping = encoder_maps.get(column)
+    if mapping is None:
         return value
-    except:
-        return 0
+    return mapping.get(value, 0)
 
 @app.route('/health', methods=['GET'])
 def health():
     """Health check"""
-    return jsonify({
-        'status': 'healthy',
-        'models_loaded': len(models) > 0,
-        'model_count': len(models)
-    })
+    return Response(health_body, mimetype='application/json')
 
 @app.route('/api/test', methods=['GET'])
 def test():
@@ -65,19 +132,11 @@ def test():
         if len(models) == 0:
             return jsonify({'error': 'Models not loaded'}), 500
             
-        # Simple test
-        test_data = pd.DataFrame([{
-            'Weight': 70,
-            'Height': 175,
-            'Age': 25,
-            'Duration': 30,
-            'Gender': 0,  # encoded
-            'Workout_Type': 0,  # encoded
-            'Intensity': 3
-        }])
+        # Simple test: weight 70, height 175, 30 min, age 25, encoded gender/workout 0, intensity 3
+        test_row = np.array([[70, 175, 30, 25, 0, 0, 3]], dtype=np.float32)
         
         # Test one model
-        hydration_pred = models['hydration'].predict(test_data[['Weight', 'Height', 'Duration', 'Age', 'Gender']])[0]
+        hydration_pred = _predict('hydration', test_row)[0]
         
         return jsonify({
             'status': 'success',
@@ -88,6 +147,106 @@ def test():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _predict(name, features):
+    """Score one model on its columns of a (n, n_features) feature matrix, skipping the sklearn wrapper"""
+    return boosters[name].inplace_predict(features[:, MODEL_COLUMNS[name]])
+
+# Micro-batching: request threads queue their feature rows and one batcher thread scores
+# everything that is waiting with a single predict call per model
+BATCH_MAX_SIZE = 64
+BATCH_WAIT_SECONDS = float(os.environ.get('BATCH_WAIT_MS', '0')) / 1000
+
+_batch_queue = queue.Queue()
+_batcher_lock = threading.Lock()
+_batcher = None
+
+def _run_batches():
+    """Batcher thread: stack queued rows, run each model once, hand every request its own row"""
+    while True:
+        batch = [_batch_queue.get()]
+        deadline = time.monotonic() + BATCH_WAIT_SECONDS
+        while len(batch) < BATCH_MAX_SIZE:
+            try:
+                batch.append(_batch_queue.get(timeout=max(0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        
+        try:
+            features = np.array([pending['row'] for pending in batch], dtype=np.float32)
+            predictions = {name: _predict(name, features) for name in MODEL_COLUMNS}
+            for i, pending in enumerate(batch):
+                pending['result'] = {name: float(values[i]) for name, values in predictions.items()}
+        except Exception as e:
+            for pending in batch:
+                pending['error'] = e
+        
+        for pending in batch:
+            pending['done'].set()
+
+def _predict_row(row):
+    """Score one feature row with all four models through the batcher thread"""
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = threading.Thread(target=_run_batches, daemon=True)
+            _batcher.start()
+    
+    pending = {'row': row, 'done': threading.Event()}
+    _batch_queue.put(pending)
+    pending['done'].wait()
+    if 'error' in pending:
+        raise pending['error']
+    return pending['result']
+
+@lru_cache(maxsize=4096)
+def _predict_recommendations(weight, height, age, duration, gender, workout_type, intensity):
+    """Run the four models for one normalized input; identical inputs hit the cache.
+    The returned dict is shared between requests and must not be mutated."""
+    # Encode categorical variables
+    gender_encoded = encode_value(gender, 'Gender')
+    workout_encoded = encode_value(workout_type, 'Workout_Type')
+    
+    predictions = _predict_row((weight, height, duration, age, gender_encoded, workout_encoded, intensity))
+    
+    hydration_ml = max(1500, min(4000, predictions['hydration']))
+    calories = max(1200, min(4000, predictions['nutrition']))
+    calorie_burn = max(50, min(1000, predictions['calorie_burn']))
+    max_hr = max(150, min(220, predictions['heart_rate']))
+    hr_60, hr_70, hr_85, hr_95 = compute_hr_zones(max_hr)
+    protein_g, carbs_g, fats_g = compute_macros(calories, 0.3, 0.4, 0.3)
+    
+    # Format responses: numeric fields carry the unit in the key; only the advice sentences are formatted
+    pre_workout_ml = round(hydration_ml * 0.2)
+    during_workout_ml = round(hydration_ml * 0.15)
+    return {
+        'hydration_strategy': {
+            'daily_total_ml': round(hydration_ml),
+            'pre_workout_ml': pre_workout_ml,
+            'during_workout_ml': during_workout_ml,
+            'recommendations': [
+                f"Drink {pre_workout_ml}ml 2 hours before workout",
+                f"Consume {during_workout_ml}ml every 20 minutes during exercise"
+            ]
+        },
+        'nutrition_strategy': {
+            'daily_calories': round(calories),
+            'protein_grams': int(protein_g),
+            'carbs_grams': int(carbs_g),
+            'fats_grams': int(fats_g)
+        },
+        'workout_benefits': {
+            'calorie_burn_range': f"{calorie_burn-30:.0f}-{calorie_burn+30:.0f} calories",
+            'muscle_groups': ['Legs', 'Core', 'Cardio'],
+            'recovery_time': f"{24 + intensity*12:.0f} hours"
+        },
+        'heart_rate_zones': {
+            'max_hr': f"{max_hr:.0f}",
+            'fat_burn_zone': f"{hr_60}-{hr_70}",
+            'cardio_zone': f"{hr_70}-{hr_85}",
+            'max_zone': f"{hr_85}-{hr_95}"
+        }
+    }
+
 @app.route('/api/recommendations', methods=['POST'])
 def recommendations():
     """Generate recommendations using XGBoost"""
@@ -95,90 +254,27 @@ def recommendations():
         if len(models) == 0:
             return jsonify({'success': False, 'error': 'Models not loaded'}), 500
         
-        data = request.json
-        print(f"📥 Request: {data}")
-        
-        # Extract and validate data
-        weight = float(data.get('weight', 70))
-        height = float(data.get('height', 175))
-        age = int(data.get('age', 25))
-        duration = float(data.get('workout_duration', 30))
-        gender = data.get('gender', 'male').lower()
-        workout_type = data.get('workout_type', 'cardio').lower()
-        intensity = float(data.get('workout_intensity', 3))
-        
-        # Encode categorical variables
-        gender_encoded = encode_value(gender, 'Gender')
-        workout_encoded = encode_value(workout_type, 'Workout_Type')
-        
-        # Predict hydration
-        hydration_features = pd.DataFrame([{
-            'Weight': weight, 'Height': height, 'Duration': duration, 
-            'Age': age, 'Gender': gender_encoded
-        }])
-        hydration_ml = models['hydration'].predict(hydration_features)[0]
-        hydration_ml = max(1500, min(4000, hydration_ml))
-        
-        # Predict nutrition
-        nutrition_features = pd.DataFrame([{
-            'Weight': weight, 'Height': height, 'Age': age,
-            'Gender': gender_encoded, 'Duration': duration, 'Workout_Type': workout_encoded
-        }])
-        calories = models['nutrition'].predict(nutrition_features)[0]
-        calories = max(1200, min(4000, calories))
-        
-        # Predict calorie burn
-        calorie_features = pd.DataFrame([{
-            'Weight': weight, 'Duration': duration, 'Age': age,
-            'Workout_Type': workout_encoded, 'Intensity': intensity
-        }])
-        calorie_burn = models['calorie_burn'].predict(calorie_features)[0]
-        calorie_burn = max(50, min(1000, calorie_burn))
-        
-        # Predict heart rate
-        hr_features = pd.DataFrame([{
-            'Age': age, 'Weight': weight, 'Duration': duration, 'Workout_Type': workout_encoded
-        }])
-        max_hr = models['heart_rate'].predict(hr_features)[0]
-        max_hr = max(150, min(220, max_hr))
-        
-        # Format responses
+        req = decode_request(request.get_data(), RecoRequest)
+        logger.info("📥 Request: %s", req)
+        
         response = {
             'success': True,
             'model_type': 'XGBoost',
-            'smart_recommendations': {
-                'hydration_strategy': {
-                    'daily_total': f"{hydration_ml:.0f}ml",
-                    'recommendations': [
-                        f"Drink {hydration_ml*0.2:.0f}ml 2 hours before workout",
-                        f"Consume {hydration_ml*0.15:.0f}ml every 20 minutes during exercise"
-                    ]
-                },
-                'nutrition_strategy': {
-                    'daily_calories': f"{calories:.0f}",
-                    'protein_grams': f"{int(calories * 0.3 / 4)}g",
-                    'carbs_grams': f"{int(calories * 0.4 / 4)}g",
-                    'fats_grams': f"{int(calories * 0.3 / 9)}g"
-                },
-                'workout_benefits': {
-                    'calorie_burn_range': f"{calorie_burn-30:.0f}-{calorie_burn+30:.0f} calories",
-                    'muscle_groups': ['Legs', 'Core', 'Cardio'],
-                    'recovery_time': f"{24 + intensity*12:.0f} hours"
-                },
-                'heart_rate_zones': {
-                    'max_hr': f"{max_hr:.0f}",
-                    'fat_burn_zone': f"{int(max_hr*0.6)}-{int(max_hr*0.7)}",
-                    'cardio_zone': f"{int(max_hr*0.7)}-{int(max_hr*0.85)}",
-                    'max_zone': f"{int(max_hr*0.85)}-{int(max_hr*0.95)}"
-                }
-            }
+            'smart_recommendations': _predict_recommendations(
+                req.weight, req.height, int(req.age), req.workout_duration,
+                req.gender.lower(), req.workout_type.lower(), req.workout_intensity
+            )
         }
         
-        print("✅ Predictions generated successfully")
+        logger.info("✅ Predictions generated successfully")
         return jsonify(response)
         
+    except RequestValidationError as e:
+        logger.warning("Invalid request: %s", e)
+        return jsonify({'success': False, 'error': str(e)}), 400
+        
     except Exception as e:
-        print(f"❌ Error: {e}")
+        logger.error("❌ Error: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 if __name__ == '__main__':
@@ -187,6 +283,6 @@ if __name__ == '__main__':
     # Load models at startup
     if load_models():
         print("🌐 Starting server on http://localhost:5001")
-        app.run(host='0.0.0.0', port=5001, debug=True)
+        app.run(host='0.0.0.0', port=5001, debug=os.environ.get('FLASK_DEBUG') == '1', threaded=True)
     else:
         print("❌ Failed to load models. Exiting.")
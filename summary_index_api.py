@@ -1,22 +1,53 @@
 """
 User Summary Index API Endpoint
 Optional backend integration for the User Summary Index system
+
+Production: gunicorn -w 1 -k gthread --threads 16 -b 0.0.0.0:5004 summary_index_api:app
+(create the database first, e.g. with setup_summary_index.py). Keep a single worker:
+background jobs live in that process's memory, so /progress/<job_id> must reach the
+worker that started the job, and all inserts then share one batching writer thread.
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
+from common_kernels import njit
 import json
+import numpy as np
+import queue
 import sqlite3
+import threading
+import time
+import uuid
 from datetime import datetime, timedelta
 import os
 
 app = Flask(__name__)
 CORS(app)
 
+DB_PATH = 'user_summary_index.db'
+
+# One connection per worker thread, opened on first use and kept for the thread's lifetime
+_local = threading.local()
+
+def get_db():
+    """Return this thread's SQLite connection"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = _local.conn = sqlite3.connect(DB_PATH)
+        conn.row_factory = sqlite3.Row  # columns by name; dict(row) is built in C
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA mmap_size=268435456')  # read pages through a 256MB memory map
+        conn.execute('PRAGMA cache_size=-64000')  # ~64MB page cache per connection
+    return conn
+
 # Database initialization
 def init_db():
     """Initialize SQLite database for index storage"""
-    conn = sqlite3.connect('user_summary_index.db')
+    # A private connection rather than get_db(): this may run in a gunicorn master before
+    # it forks, and SQLite connections must not be carried across a fork
+    conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
     # Create table for index history
@@ -34,8 +65,13 @@ def init_db():
         )
     ''')
     
-    # Create index for efficient queries
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_date ON user_index_history(user_id, created_at)')
+    # Covering index: the compare lookups and the history range scan's filter/sort
+    # are answered from the index alone (it supersedes the old idx_user_date)
+    cursor.execute('DROP INDEX IF EXISTS idx_user_date')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_user_date_cov
+        ON user_index_history(user_id, created_at, score, level, total_workouts)
+    ''')
     
     conn.commit()
     conn.close()
@@ -96,6 +132,93 @@ def calculate_summary_index():
             'error': str(e)
         }), 500
 
+# Background calculations: job id -> {'events': queue of (event, payload) messages for the
+# SSE stream, 'finished_at': monotonic time the job finished or None}. Streamed jobs are
+# removed when their result is read; finished jobs nobody reads expire after JOB_TTL_SECONDS
+JOB_TTL_SECONDS = 600
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+def _evict_expired_jobs():
+    """Drop finished jobs whose result has not been read within JOB_TTL_SECONDS"""
+    cutoff = time.monotonic() - JOB_TTL_SECONDS
+    with _jobs_lock:
+        expired = [job_id for job_id, job in _jobs.items()
+                   if job['finished_at'] is not None and job['finished_at'] < cutoff]
+        for job_id in expired:
+            del _jobs[job_id]
+
+def _run_calculation(job_id, user_id, workout_history):
+    """Worker thread for /calculate/async: report progress, then the result or the error"""
+    job = _jobs[job_id]
+    events = job['events']
+    try:
+        events.put(('progress', {'status': 'calculating', 'total_workouts': len(workout_history)}))
+        index_data = calculate_index_from_history(workout_history)
+        
+        if workout_history:
+            events.put(('progress', {'status': 'saving'}))
+            save_index_to_db(user_id, index_data)
+        
+        events.put(('done', {'success': True, 'data': index_data}))
+    except Exception as e:
+        events.put(('done', {'success': False, 'error': str(e)}))
+    finally:
+        job['finished_at'] = time.monotonic()
+
+@app.route('/api/summary-index/calculate/async', methods=['POST'])
+def calculate_summary_index_async():
+    """
+    Start an index calculation in the background (same payload as /calculate).
+    Progress and the result are streamed from /api/summary-index/progress/<job_id>.
+    """
+    try:
+        data = request.json
+        _evict_expired_jobs()
+        job_id = uuid.uuid4().hex
+        with _jobs_lock:
+            _jobs[job_id] = {'events': queue.Queue(), 'finished_at': None}
+        threading.Thread(
+            target=_run_calculation,
+            args=(job_id, data.get('user_id', 'default'), data.get('workout_history', [])),
+            daemon=True
+        ).start()
+        
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'progress_url': f'/api/summary-index/progress/{job_id}'
+        }), 202
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/summary-index/progress/<job_id>', methods=['GET'])
+def calculation_progress(job_id):
+    """Server-Sent Events stream for a background calculation; ends with an `event: done` message"""
+    job = _jobs.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Unknown job id'
+        }), 404
+    events = job['events']
+    
+    def stream():
+        while True:
+            event, payload = events.get()
+            if event == 'done':
+                with _jobs_lock:
+                    _jobs.pop(job_id, None)
+                yield f"event: done\ndata: {json.dumps(payload)}\n\n"
+                return
+            yield f"data: {json.dumps(payload)}\n\n"
+    
+    return Response(stream_with_context(stream()), mimetype='text/event-stream')
+
 @app.route('/api/summary-index/history/<user_id>', methods=['GET'])
 def get_index_history(user_id):
     """Get historical index data for a user"""
@@ -103,33 +226,27 @@ def get_index_history(user_id):
         days = request.args.get('days', 30, type=int)
         cutoff_date = datetime.now() - timedelta(days=days)
         
-        conn = sqlite3.connect('user_summary_index.db')
+        conn = get_db()
         cursor = conn.cursor()
         
+        # SQLite's JSON1 builds each entry, splicing the stored components text in as JSON,
+        # so rows go to the response without a json.loads/json.dumps round trip in Python
         cursor.execute('''
-            SELECT score, level, components, total_workouts, created_at
+            SELECT json_object(
+                'score', score,
+                'level', level,
+                'components', json(coalesce(nullif(components, ''), '{}')),
+                'total_workouts', total_workouts,
+                'timestamp', created_at
+            ) AS entry
             FROM user_index_history 
             WHERE user_id = ? AND created_at >= ?
             ORDER BY created_at ASC
         ''', (user_id, cutoff_date))
         
-        rows = cursor.fetchall()
-        conn.close()
-        
-        history = []
-        for row in rows:
-            history.append({
-                'score': row[0],
-                'level': row[1],
-                'components': json.loads(row[2]) if row[2] else {},
-                'total_workouts': row[3],
-                'timestamp': row[4]
-            })
+        history = ','.join(row['entry'] for row in cursor.fetchall())
         
-        return jsonify({
-            'success': True,
-            'data': history
-        })
+        return Response('{"success": true, "data": [' + history + ']}', mimetype='application/json')
         
     except Exception as e:
         return jsonify({
@@ -143,12 +260,12 @@ def compare_with_previous(user_id):
     try:
         days = request.args.get('days', 7, type=int)
         
-        conn = sqlite3.connect('user_summary_index.db')
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get current (latest) index
         cursor.execute('''
-            SELECT score, created_at FROM user_index_history 
+            SELECT score FROM user_index_history 
             WHERE user_id = ? ORDER BY created_at DESC LIMIT 1
         ''', (user_id,))
         current = cursor.fetchone()
@@ -168,13 +285,12 @@ def compare_with_previous(user_id):
         ''', (user_id, cutoff_date))
         previous = cursor.fetchone()
         
-        conn.close()
         
         if not previous:
             return jsonify({
                 'success': True,
                 'data': {
-                    'current': current[0],
+                    'current': current['score'],
                     'previous': None,
                     'difference': None,
                     'percent_change': None,
@@ -182,15 +298,15 @@ def compare_with_previous(user_id):
                 }
             })
         
-        difference = current[0] - previous[0]
-        percent_change = round((difference / previous[0]) * 100, 1) if previous[0] > 0 else 0
+        difference = current['score'] - previous['score']
+        percent_change = round((difference / previous['score']) * 100, 1) if previous['score'] > 0 else 0
         trend = 'improving' if difference > 0 else 'declining' if difference < 0 else 'stable'
         
         return jsonify({
             'success': True,
             'data': {
-                'current': current[0],
-                'previous': previous[0],
+                'current': current['score'],
+                'previous': previous['score'],
                 'difference': difference,
                 'percent_change': percent_change,
                 'trend': trend,
@@ -204,6 +320,32 @@ def compare_with_previous(user_id):
             'error': str(e)
         }), 500
 
+IMPROVEMENT_SCORE = 50  # Neutral for simplified version
+INTENSITY_SCORE = 70  # Default intensity score
+
+@njit(cache=True)
+def _score_kernel(calories, variety_types):
+    """Average calories, the simplified component scores (0-100) and the weighted index score"""
+    total_workouts = calories.shape[0]
+    total_calories = 0.0
+    for value in calories:
+        total_calories += value
+    avg_calories = total_calories / total_workouts
+    
+    consistency = min(100.0, (total_workouts / 10) * 100)  # 10 workouts = 100 points
+    performance = min(100.0, (avg_calories / 500) * 100)   # 500 cal = 100 points
+    variety = variety_types * 20.0
+    
+    # Weighted final score
+    weighted_score = (
+        consistency * 0.25 +
+        performance * 0.25 +
+        IMPROVEMENT_SCORE * 0.20 +
+        variety * 0.15 +
+        INTENSITY_SCORE * 0.15
+    )
+    return avg_calories, consistency, performance, variety, weighted_score
+
 def calculate_index_from_history(workout_history):
     """Calculate index using the same algorithm as frontend JavaScript"""
     
@@ -222,32 +364,13 @@ def calculate_index_from_history(workout_history):
     
     # Basic calculations (simplified for example)
     total_workouts = len(workout_history)
-    avg_calories = sum(w.get('calories', 0) for w in workout_history) / total_workouts
-    avg_duration = sum(w.get('duration', 30) for w in workout_history) / total_workouts
+    calories = np.fromiter((w.get('calories', 0) for w in workout_history), dtype=np.float64, count=total_workouts)
+    variety_types = len({w.get('workout_type', 'Unknown') for w in workout_history})
     
-    # Simplified component scores (0-100)
-    consistency = min(100, (total_workouts / 10) * 100)  # 10 workouts = 100 points
-    performance = min(100, (avg_calories / 500) * 100)   # 500 cal = 100 points
-    improvement = 50  # Neutral for simplified version
-    variety = len(set(w.get('workout_type', 'Unknown') for w in workout_history)) * 20
-    intensity = 70  # Default intensity score
-    
-    # Weighted final score
-    weights = {
-        'consistency': 0.25,
-        'performance': 0.25,
-        'improvement': 0.20,
-        'variety': 0.15,
-        'intensity': 0.15
-    }
-    
-    score = round(
-        consistency * weights['consistency'] +
-        performance * weights['performance'] +
-        improvement * weights['improvement'] +
-        variety * weights['variety'] +
-        intensity * weights['intensity']
-    )
+    avg_calories, consistency, performance, variety, weighted_score = _score_kernel(calories, variety_types)
+    improvement = IMPROVEMENT_SCORE
+    intensity = INTENSITY_SCORE
+    score = round(weighted_score)
     
     # Determine performance level
     if score >= 90: level = 'Elite Athlete'
@@ -283,79 +406,116 @@ def calculate_index_from_history(workout_history):
         'timestamp': datetime.now().isoformat()
     }
 
-def save_index_to_db(user_id, index_data):
-    """Save index data to database"""
-    try:
-        conn = sqlite3.connect('user_summary_index.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO user_index_history 
-            (user_id, score, level, components, insights, total_workouts, average_calories)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            user_id,
-            index_data['score'],
-            index_data['level'],
-            json.dumps(index_data['components']),
-            json.dumps(index_data['insights']),
-            index_data.get('total_workouts', 0),
-            index_data.get('average_calories', 0)
-        ))
+INSERT_INDEX_SQL = '''
+    INSERT INTO user_index_history 
+    (user_id, score, level, components, insights, total_workouts, average_calories)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+WRITE_BATCH_SIZE = 32
+
+# Inserts from all request threads go through one writer thread, which commits whatever
+# has queued up while the previous transaction was syncing as a single batch
+_write_queue = queue.Queue()
+_writer_lock = threading.Lock()
+_writer = None
+
+def _write_batches():
+    """Writer thread: commit queued inserts in batches and wake up their callers"""
+    while True:
+        batch = [_write_queue.get()]
+        while len(batch) < WRITE_BATCH_SIZE:
+            try:
+                batch.append(_write_queue.get_nowait())
+            except queue.Empty:
+                break
         
-        conn.commit()
-        conn.close()
-        return True
+        try:
+            conn = get_db()
+            with conn:
+                conn.executemany(INSERT_INDEX_SQL, [pending['row'] for pending in batch])
+            saved = True
+        except Exception as e:
+            print(f"Error saving to database: {e}")
+            saved = False
         
+        for pending in batch:
+            pending['saved'] = saved
+            pending['done'].set()
+
+def save_index_to_db(user_id, index_data):
+    """Save index data to database (returns once the row's batch is committed)"""
+    global _writer
+    try:
+        pending = {
+            'row': (
+                user_id,
+                index_data['score'],
+                index_data['level'],
+                json.dumps(index_data['components']),
+                json.dumps(index_data['insights']),
+                index_data.get('total_workouts', 0),
+                index_data.get('average_calories', 0)
+            ),
+            'saved': False,
+            'done': threading.Event()
+        }
     except Exception as e:
         print(f"Error saving to database: {e}")
         return False
+    
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_write_batches, daemon=True)
+            _writer.start()
+    
+    _write_queue.put(pending)
+    pending['done'].wait()
+    return pending['saved']
+
+EXPORT_FETCH_SIZE = 256
 
 @app.route('/api/summary-index/export/<user_id>', methods=['GET'])
 def export_user_data(user_id):
-    """Export user's complete index data"""
+    """Export user's complete index data (streamed, so memory stays flat for long histories)"""
     try:
-        conn = sqlite3.connect('user_summary_index.db')
-        cursor = conn.cursor()
-        
+        cursor = get_db().cursor()
+        cursor.arraysize = EXPORT_FETCH_SIZE
         cursor.execute('''
-            SELECT * FROM user_index_history 
+            SELECT id, user_id, score, level, total_workouts, average_calories, created_at,
+                   components, insights
+            FROM user_index_history 
             WHERE user_id = ? 
             ORDER BY created_at ASC
         ''', (user_id,))
         
-        rows = cursor.fetchall()
-        conn.close()
-        
-        export_data = []
-        for row in rows:
-            export_data.append({
-                'id': row[0],
-                'user_id': row[1],
-                'score': row[2],
-                'level': row[3],
-                'components': json.loads(row[4]) if row[4] else {},
-                'insights': json.loads(row[5]) if row[5] else [],
-                'total_workouts': row[6],
-                'average_calories': row[7],
-                'created_at': row[8]
-            })
-        
-        return jsonify({
-            'success': True,
-            'data': {
-                'user_id': user_id,
-                'export_date': datetime.now().isoformat(),
-                'total_entries': len(export_data),
-                'history': export_data
-            }
-        })
-        
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
+    
+    def stream():
+        head = json.dumps({'user_id': user_id, 'export_date': datetime.now().isoformat()})
+        yield '{"success": true, "data": ' + head[:-1] + ', "history": ['
+        
+        total_entries = 0
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                break
+            for row in rows:
+                fields = dict(row)
+                # components/insights are stored as JSON text, so they are spliced in verbatim
+                components = fields.pop('components') or '{}'
+                insights = fields.pop('insights') or '[]'
+                entry = json.dumps(fields)
+                yield (', ' if total_entries else '') + entry[:-1] + \
+                    ', "components": ' + components + ', "insights": ' + insights + '}'
+                total_entries += 1
+        
+        yield '], "total_entries": ' + str(total_entries) + '}}'
+    
+    return Response(stream_with_context(stream()), mimetype='application/json')
 
 @app.route('/api/summary-index/health', methods=['GET'])
 def health_check():
@@ -367,10 +527,15 @@ def health_check():
         'timestamp': datetime.now().isoformat()
     })
 
-if __name__ == '__main__':
+def run_server(use_reloader=None):
+    """Initialize the database and run the API server (debug mode only with FLASK_DEBUG=1)"""
     # Initialize database on startup
     init_db()
     
     # Run the API server
     port = int(os.environ.get('PORT', 5004))
-    app.run(host='0.0.0.0', port=port, debug=True)
+    app.run(host='0.0.0.0', port=port, debug=os.environ.get('FLASK_DEBUG') == '1',
+            threaded=True, use_reloader=use_reloader)
+
+if __name__ == '__main__':
+    run_server()
@@ -80,13 +80,15 @@ def test_collaborative_filtering():
     print("\n6. Testing performance...")
     import time
     
-    start_time = time.time()
-    for i in range(10):
-        _ = engine.predict(f"user_{i+1}", 5)
-    end_time = time.time()
+    # Warm-up call so first-call setup is not counted in the measurement
+    _ = engine.predict("user_warm", 5)
     
-    print(f"   Generated 10 recommendation sets in {end_time - start_time:.3f} seconds")
-    print(f"   Average time per recommendation: {(end_time - start_time) / 10:.3f} seconds")
+    start_ns = time.perf_counter_ns()
+    _ = engine.predict_batch([f"user_{i+1}" for i in range(10)], 5)
+    elapsed_ns = time.perf_counter_ns() - start_ns
+    
+    print(f"   Generated 10 recommendation sets in {elapsed_ns / 1e6:.3f} ms")
+    print(f"   Average time per recommendation: {elapsed_ns / 10 / 1e6:.3f} ms")
     
     # Final model info check
     print("\n7. Final model status:")
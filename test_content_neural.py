@@ -3,8 +3,14 @@ Test script for Content-Based Filtering and Neural Network functionality
 Testing the enhanced AdvancedRecommendationEngine with all components
 """
 
+import functools
 from advanced_recommendation_engine import AdvancedRecommendationEngine
 
+@functools.cache
+def _get_engine():
+    """Build the engine once per process; later calls reuse it"""
+    return AdvancedRecommendationEngine()
+
 def test_content_and_neural():
     print("=" * 70)
     print("TESTING CONTENT-BASED FILTERING AND NEURAL NETWORK FUNCTIONALITY")
@@ -12,7 +18,9 @@ def test_content_and_neural():
     
     # Initialize the advanced engine
     print("\n1. Initializing AdvancedRecommendationEngine with all components...")
-    engine = AdvancedRecommendationEngine()
+    engine = _get_engine()
+    # The instance may be shared with an earlier run, so start from an empty cache
+    engine.clear_cache()
     
     # Check model info
     print("\n2. Checking all model capabilities...")
@@ -65,10 +73,12 @@ def test_content_and_neural():
         
         # Add some custom interactions to test neural network
         print("   Adding custom interactions for neural network testing...")
-        engine.add_user_interaction("neural_test_user", "item_5", 4.8)
-        engine.add_user_interaction("neural_test_user", "item_12", 3.2)
-        engine.add_user_interaction("neural_test_user", "item_20", 4.5)
-        engine.add_user_interaction("neural_test_user", "item_35", 2.1)
+        engine.add_user_interactions([
+            ("neural_test_user", "item_5", 4.8),
+            ("neural_test_user", "item_12", 3.2),
+            ("neural_test_user", "item_20", 4.5),
+            ("neural_test_user", "item_35", 2.1)
+        ])
         
         # Get recommendations
         neural_recs = engine.predict("neural_test_user", 5)
@@ -100,18 +110,20 @@ def test_content_and_neural():
     print("\n8. Testing performance with all components...")
     import time
     
-    start_time = time.time()
-    total_recs = 0
+    # Only the predict call is inside the timed region; counting and printing happen after
+    start_ns = time.perf_counter_ns()
+    results = engine.predict_batch([f"user_{i+1}" for i in range(20)], 5)
+    elapsed = (time.perf_counter_ns() - start_ns) / 1e9
     
-    for i in range(20):
-        recs = engine.predict(f"user_{i+1}", 5)
-        total_recs += len(recs)
+    total_recs = sum(len(recs) for recs in results)
     
-    end_time = time.time()
+    print(f"   Generated {total_recs} recommendations for 20 users in {elapsed:.3f} seconds")
+    print(f"   Average time per user: {elapsed / 20:.3f} seconds")
+    print(f"   Average time per recommendation: {elapsed / total_recs:.4f} seconds")
     
-    print(f"   Generated {total_recs} recommendations for 20 users in {end_time - start_time:.3f} seconds")
-    print(f"   Average time per user: {(end_time - start_time) / 20:.3f} seconds")
-    print(f"   Average time per recommendation: {(end_time - start_time) / total_recs:.4f} seconds")
+    # Process-parallel variant: only pays off for expensive hybrid calls, so it is checked, not timed
+    parallel_results = engine.predict_many([f"user_{i+1}" for i in range(20)], 5, workers=2)
+    print(f"   predict_many() matches predict_batch(): {'✓' if parallel_results == results else '✗'}")
     
     # Final comprehensive check
     print("\n9. Final system status:")
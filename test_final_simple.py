@@ -35,16 +35,19 @@ def test_final_compatibility():
     
     # Test caching
     print("\n3. Testing Caching...")
-    start_time = time.time()
+    # Warm-up call so one-time BLAS/JIT setup is not counted as a cache miss
+    _ = engine.predict("_warmup_user", 1)
+    
+    start_time = time.perf_counter()
     cache_test_recs = engine.predict("cache_user", 5)
-    first_call_time = time.time() - start_time
+    first_call_time = time.perf_counter() - start_time
     
-    start_time = time.time()
+    start_time = time.perf_counter()
     cached_recs = engine.predict("cache_user", 5)
-    second_call_time = time.time() - start_time
+    second_call_time = time.perf_counter() - start_time
     
-    print(f"   [OK] First call: {first_call_time:.4f}s")
-    print(f"   [OK] Second call: {second_call_time:.4f}s")
+    print(f"   [OK] First call: {first_call_time * 1e6:.1f} us")
+    print(f"   [OK] Second call: {second_call_time * 1e6:.1f} us")
     
     # Test cold-start users
     print("\n4. Testing Cold-Start Users...")
@@ -13,7 +13,10 @@ domain-specific recommendations for wellness areas:
 """
 
 from advanced_recommendation_engine import AdvancedRecommendationEngine
+import contextlib
+import io
 import json
+import sys
 
 def test_wellness_recommendations():
     print("=" * 80)
@@ -92,11 +95,13 @@ def test_wellness_recommendations():
     print("\n3. Testing Domain-Specific Wellness Recommendations...")
     
     for domain, context in domains_to_test:
-        print(f"\n   Testing {domain.upper()} recommendations:")
         context['domain'] = domain
-        
-        # Get domain-specific recommendations
-        recommendations = engine.predict(user_id, n_items=3, context=context, domain=domain)
+    
+    # Get domain-specific recommendations for every domain in one call
+    domain_recommendations = engine.predict_domains(user_id, domains_to_test, n_items=3)
+    
+    for (domain, _), recommendations in zip(domains_to_test, domain_recommendations):
+        print(f"\n   Testing {domain.upper()} recommendations:")
         
         if recommendations:
             for i, rec in enumerate(recommendations):
@@ -181,7 +186,14 @@ def test_wellness_recommendations():
 
 if __name__ == "__main__":
     try:
-        success = test_wellness_recommendations()
+        # Collect the report in memory and write it out once rather than once per print()
+        report = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(report):
+                success = test_wellness_recommendations()
+        finally:
+            sys.stdout.write(report.getvalue())
+            sys.stdout.flush()
         if success:
             print("\n[SUCCESS] All wellness recommendation tests passed!")
             print("The system is ready for personalized wellness recommendations!")
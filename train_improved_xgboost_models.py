@@ -5,137 +5,181 @@ from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import mean_absolute_error, r2_score
 import joblib
+from joblib import Parallel, delayed
 import os
+from common_kernels import compute_training_features
 
-def load_and_preprocess_data():
-    """Load and preprocess the workout fitness tracker data"""
+# PyArrow parses the CSV on several threads when it is installed
+try:
+    import pyarrow  # noqa: F401
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# Pickle protocol 5 writes the boosters' raw bytearrays straight to the file (no bytes copy)
+PICKLE_PROTOCOL = 5
+
+# The four models train side by side, so each gets a quarter of the cores
+MODEL_THREADS = max(1, (os.cpu_count() or 1) // 4)
+
+# One entry per model: feature columns, target column, tree shape and how it reports progress
+MODEL_CONFIGS = [
+    {
+        'name': 'hydration',
+        'title': "💧 Training hydration prediction model...",
+        'label': 'Hydration Model',
+        'unit': 'ml',
+        'features': ['Weight (kg)', 'Height (cm)', 'Workout Duration (mins)',
+                     'Workout_Intensity_encoded', 'Age'],
+        'target': 'Theoretical_Hydration',  # Using calculated hydration as target
+        'n_estimators': 100,
+        'max_depth': 6
+    },
+    {
+        'name': 'nutrition',
+        'title': "🍎 Training nutrition prediction model...",
+        'label': 'Nutrition Model',
+        'unit': ' calories',
+        'features': ['Age', 'Weight (kg)', 'Height (cm)', 'Gender_encoded',
+                     'Workout Duration (mins)', 'Workout_Intensity_encoded', 'BMR'],
+        'target': 'Theoretical_Daily_Calories',  # Using calculated daily calories as target
+        'n_estimators': 150,
+        'max_depth': 8
+    },
+    {
+        'name': 'calorie_burn',
+        'title': "🎯 Training calorie burn prediction model...",
+        'label': 'Calorie Burn Model',
+        'unit': ' calories',
+        'features': ['Weight (kg)', 'Workout Duration (mins)', 'Workout_Intensity_encoded',
+                     'Workout_Type_encoded', 'Age', 'Heart Rate (bpm)'],
+        'target': 'Calories Burned',  # Using actual calories burned from data
+        'n_estimators': 200,
+        'max_depth': 7
+    },
+    {
+        'name': 'heart_rate',
+        'title': "❤️ Training heart rate zone prediction model...",
+        'label': 'Heart Rate Model',
+        'unit': ' bpm',
+        'features': ['Age', 'Resting Heart Rate (bpm)', 'Workout_Intensity_encoded',
+                     'Workout_Type_encoded', 'VO2 Max'],
+        'target': 'Theoretical_Max_HR',  # Using calculated max HR as target
+        'n_estimators': 100,
+        'max_depth': 5
+    }
+]
+
+# Raw CSV columns the models and saved statistics need; the rest of the file is never materialized
+TRAINING_COLUMNS = ['Age', 'Gender', 'Height (cm)', 'Weight (kg)', 'Workout Type',
+                    'Workout Duration (mins)', 'Calories Burned', 'Heart Rate (bpm)',
+                    'Workout Intensity', 'Resting Heart Rate (bpm)', 'VO2 Max']
+
+def read_workout_csv(path='workout_fitness_tracker_data.csv', usecols=None):
+    """Read the tracker CSV with the PyArrow engine when available, the C parser otherwise"""
+    if PYARROW_AVAILABLE:
+        return pd.read_csv(path, engine='pyarrow', usecols=usecols)
+    return pd.read_csv(path, usecols=usecols)
+
+def encode_categorical(values):
+    """Integer codes for a categorical column plus a LabelEncoder holding the same classes.
+    pd.Categorical encodes in one hashed pass; its sorted categories match LabelEncoder's classes."""
+    categorical = pd.Categorical(values)
+    encoder = LabelEncoder()
+    encoder.classes_ = categorical.categories.to_numpy()
+    return categorical.codes, encoder
+
+def load_and_preprocess_data(path='workout_fitness_tracker_data.csv'):
+    """Load and preprocess the workout fitness tracker data.
+    The result is cached under .cache/, keyed on the CSV's and this script's mtime and size."""
     print("📊 Loading workout fitness tracker data...")
     
+    key = '_'.join(f'{st.st_mtime_ns}-{st.st_size}' for st in (os.stat(path), os.stat(__file__)))
+    cache_file = os.path.join('.cache', f'features_{key}.pkl')
+    if os.path.exists(cache_file):
+        df, label_encoders = joblib.load(cache_file)
+        print(f"✅ Loaded {len(df)} preprocessed workout records from {cache_file}")
+        return df, label_encoders
+    
     # Load the CSV data
-    df = pd.read_csv('workout_fitness_tracker_data.csv')
+    df = read_workout_csv(path, usecols=TRAINING_COLUMNS)
     print(f"✅ Loaded {len(df)} workout records")
     
+    df, label_encoders = preprocess_data(df)
+    
+    os.makedirs('.cache', exist_ok=True)
+    joblib.dump((df, label_encoders), cache_file, protocol=PICKLE_PROTOCOL)
+    return df, label_encoders
+
+def preprocess_data(df):
+    """Encode the categorical columns and derive the model targets"""
     # Create label encoders for categorical variables
     label_encoders = {}
     
     # Encode Gender
-    label_encoders['gender'] = LabelEncoder()
-    df['Gender_encoded'] = label_encoders['gender'].fit_transform(df['Gender'])
+    df['Gender_encoded'], label_encoders['gender'] = encode_categorical(df['Gender'])
     
     # Encode Workout Type
-    label_encoders['workout_type'] = LabelEncoder()
-    df['Workout_Type_encoded'] = label_encoders['workout_type'].fit_transform(df['Workout Type'])
+    df['Workout_Type_encoded'], label_encoders['workout_type'] = encode_categorical(df['Workout Type'])
     
     # Encode Workout Intensity
     intensity_map = {'Low': 1, 'Medium': 2, 'High': 3}
     df['Workout_Intensity_encoded'] = df['Workout Intensity'].map(intensity_map)
     
-    # Create BMR calculation (Mifflin-St Jeor equation)
-    df['BMR'] = np.where(df['Gender'] == 'Male',
-                        (10 * df['Weight (kg)']) + (6.25 * df['Height (cm)']) - (5 * df['Age']) + 5,
-                        (10 * df['Weight (kg)']) + (6.25 * df['Height (cm)']) - (5 * df['Age']) - 161)
-    
-    # Calculate activity multiplier based on workout intensity and duration
-    df['Activity_Multiplier'] = 1.2 + (df['Workout_Intensity_encoded'] * 0.2) + (df['Workout Duration (mins)'] / 120)
-    
-    # Calculate theoretical daily calories needed
-    df['Theoretical_Daily_Calories'] = df['BMR'] * df['Activity_Multiplier']
-    
-    # Calculate hydration needs (35ml per kg + exercise adjustment)
-    df['Theoretical_Hydration'] = (df['Weight (kg)'] * 35) + (df['Workout Duration (mins)'] * df['Workout_Intensity_encoded'] * 10)
-    
-    # Calculate theoretical max heart rate
-    df['Theoretical_Max_HR'] = 220 - df['Age']
+    # Derive BMR (Mifflin-St Jeor), activity multiplier, daily calories, hydration
+    # (35ml per kg + exercise adjustment) and max heart rate in one fused pass
+    weight = df['Weight (kg)'].to_numpy()
+    age = df['Age'].to_numpy()
+    intensity = df['Workout_Intensity_encoded'].to_numpy()
+    duration = df['Workout Duration (mins)'].to_numpy()
+    bmr = np.empty(len(df))
+    multiplier = np.empty(len(df))
+    calories = np.empty(len(df))
+    hydration = np.empty(len(df), dtype=np.result_type(weight, intensity, duration))
+    max_hr = np.empty_like(age)
+    compute_training_features(weight, df['Height (cm)'].to_numpy(), age, df['Gender'].to_numpy() == 'Male',
+                              intensity, duration, bmr, multiplier, calories, hydration, max_hr)
+    df['BMR'] = bmr
+    df['Activity_Multiplier'] = multiplier
+    df['Theoretical_Daily_Calories'] = calories
+    df['Theoretical_Hydration'] = hydration
+    df['Theoretical_Max_HR'] = max_hr
     
     print("🔄 Data preprocessing completed")
     return df, label_encoders
 
-def train_hydration_model(df):
-    """Train XGBoost model for hydration prediction"""
-    print("💧 Training hydration prediction model...")
-    
-    # Features for hydration prediction
-    features = ['Weight (kg)', 'Height (cm)', 'Workout Duration (mins)', 
-               'Workout_Intensity_encoded', 'Age']
-    
-    X = df[features]
-    y = df['Theoretical_Hydration']  # Using calculated hydration as target
-    
-    # Split the data
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    
-    # Train XGBoost model
-    model = XGBRegressor(
-        n_estimators=100,
-        max_depth=6,
-        learning_rate=0.1,
-        random_state=42
-    )
-    
-    model.fit(X_train, y_train)
-    
-    # Evaluate
-    y_pred = model.predict(X_test)
-    mae = mean_absolute_error(y_test, y_pred)
-    r2 = r2_score(y_test, y_pred)
-    
-    print(f"   📈 Hydration Model - MAE: {mae:.2f}ml, R²: {r2:.3f}")
-    
-    return model
+def prepare_training_data(df):
+    """Convert every model feature to one float32 matrix and draw the train/test split once.
+    Rows are stored training rows first, so each model's split is two contiguous slices."""
+    columns = list(dict.fromkeys(name for config in MODEL_CONFIGS for name in config['features']))
+    train_idx, test_idx = train_test_split(np.arange(len(df)), test_size=0.2, random_state=42)
+    order = np.concatenate((train_idx, test_idx))
+    return {
+        'df': df,
+        'features': df[columns].to_numpy(dtype=np.float32)[order],
+        'columns': {name: i for i, name in enumerate(columns)},
+        'order': order,
+        'n_train': len(train_idx)
+    }
 
-def train_nutrition_model(df):
-    """Train XGBoost model for nutrition prediction"""
-    print("🍎 Training nutrition prediction model...")
-    
-    # Features for nutrition prediction
-    features = ['Age', 'Weight (kg)', 'Height (cm)', 'Gender_encoded', 
-               'Workout Duration (mins)', 'Workout_Intensity_encoded', 'BMR']
-    
-    X = df[features]
-    y = df['Theoretical_Daily_Calories']  # Using calculated daily calories as target
-    
-    # Split the data
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    
-    # Train XGBoost model
-    model = XGBRegressor(
-        n_estimators=150,
-        max_depth=8,
-        learning_rate=0.1,
-        random_state=42
-    )
-    
-    model.fit(X_train, y_train)
-    
-    # Evaluate
-    y_pred = model.predict(X_test)
-    mae = mean_absolute_error(y_test, y_pred)
-    r2 = r2_score(y_test, y_pred)
-    
-    print(f"   📈 Nutrition Model - MAE: {mae:.2f} calories, R²: {r2:.3f}")
-    
-    return model
+def split_training_data(data, features, target):
+    """Train/test arrays for one model, cut from the shared feature matrix and split"""
+    n_train = data['n_train']
+    X = data['features'][:, [data['columns'][name] for name in features]]
+    y = data['df'][target].to_numpy()[data['order']]
+    return X[:n_train], X[n_train:], y[:n_train], y[n_train:]
 
-def train_calorie_burn_model(df):
-    """Train XGBoost model for calorie burn prediction"""
-    print("🎯 Training calorie burn prediction model...")
-    
-    # Features for calorie burn prediction
-    features = ['Weight (kg)', 'Workout Duration (mins)', 'Workout_Intensity_encoded',
-               'Workout_Type_encoded', 'Age', 'Heart Rate (bpm)']
+def fit_xgboost_model(config, X_train, X_test, y_train, y_test, **params):
+    """Fit the XGBoost model described by a MODEL_CONFIGS entry and report its test metrics"""
+    print(config['title'])
     
-    X = df[features]
-    y = df['Calories Burned']  # Using actual calories burned from data
-    
-    # Split the data
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    
-    # Train XGBoost model
     model = XGBRegressor(
-        n_estimators=200,
-        max_depth=7,
+        n_estimators=config['n_estimators'],
+        max_depth=config['max_depth'],
         learning_rate=0.1,
-        random_state=42
+        tree_method='hist',
+        random_state=42,
+        **params
     )
     
     model.fit(X_train, y_train)
@@ -145,78 +189,44 @@ def train_calorie_burn_model(df):
     mae = mean_absolute_error(y_test, y_pred)
     r2 = r2_score(y_test, y_pred)
     
-    print(f"   📈 Calorie Burn Model - MAE: {mae:.2f} calories, R²: {r2:.3f}")
+    print(f"   📈 {config['label']} - MAE: {mae:.2f}{config['unit']}, R²: {r2:.3f}")
     
     return model
 
-def train_heart_rate_model(df):
-    """Train XGBoost model for heart rate zone prediction"""
-    print("❤️ Training heart rate zone prediction model...")
-    
-    # Features for heart rate prediction
-    features = ['Age', 'Resting Heart Rate (bpm)', 'Workout_Intensity_encoded',
-               'Workout_Type_encoded', 'VO2 Max']
-    
-    X = df[features]
-    y = df['Theoretical_Max_HR']  # Using calculated max HR as target
-    
-    # Split the data
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    
-    # Train XGBoost model
-    model = XGBRegressor(
-        n_estimators=100,
-        max_depth=5,
-        learning_rate=0.1,
-        random_state=42
-    )
-    
-    model.fit(X_train, y_train)
-    
-    # Evaluate
-    y_pred = model.predict(X_test)
-    mae = mean_absolute_error(y_test, y_pred)
-    r2 = r2_score(y_test, y_pred)
-    
-    print(f"   📈 Heart Rate Model - MAE: {mae:.2f} bpm, R²: {r2:.3f}")
-    
-    return model
+def train_model(config, data):
+    """Train one model from the shared feature matrix"""
+    X_train, X_test, y_train, y_test = split_training_data(data, config['features'], config['target'])
+    return fit_xgboost_model(config, X_train, X_test, y_train, y_test, n_jobs=MODEL_THREADS)
 
-def save_models_and_encoders(hydration_model, nutrition_model, calorie_model, 
-                           heart_rate_model, label_encoders, df):
+def save_models_and_encoders(models, label_encoders, df):
     """Save all trained models and encoders"""
     print("💾 Saving trained models...")
     
     # Create models directory if it doesn't exist
     os.makedirs('ml_models', exist_ok=True)
     
-    # Save models
-    joblib.dump(hydration_model, 'ml_models/hydration_xgboost_model.pkl')
-    print("   ✅ Saved hydration_xgboost_model.pkl")
-    
-    joblib.dump(nutrition_model, 'ml_models/nutrition_xgboost_model.pkl')
-    print("   ✅ Saved nutrition_xgboost_model.pkl")
-    
-    joblib.dump(calorie_model, 'ml_models/calorie_burn_xgboost_model.pkl')
-    print("   ✅ Saved calorie_burn_xgboost_model.pkl")
-    
-    joblib.dump(heart_rate_model, 'ml_models/heart_rate_xgboost_model.pkl')
-    print("   ✅ Saved heart_rate_xgboost_model.pkl")
+    # Save models, as pickled XGBRegressors and as native UBJSON boosters
+    for model_name, model in models.items():
+        joblib.dump(model, f'ml_models/{model_name}_xgboost_model.pkl', protocol=PICKLE_PROTOCOL)
+        print(f"   ✅ Saved {model_name}_xgboost_model.pkl")
+        model.get_booster().save_model(f'ml_models/{model_name}_xgboost_model.ubj')
+        print(f"   ✅ Saved {model_name}_xgboost_model.ubj")
     
     # Save label encoders
-    joblib.dump(label_encoders, 'ml_models/label_encoders.pkl')
+    joblib.dump(label_encoders, 'ml_models/label_encoders.pkl', protocol=PICKLE_PROTOCOL)
     print("   ✅ Saved label_encoders.pkl")
     
     # Save data statistics for normalization
+    body_stats = df[['Weight (kg)', 'Height (cm)']].agg(['mean', 'std'])
     data_stats = {
-        'weight_mean': df['Weight (kg)'].mean(),
-        'weight_std': df['Weight (kg)'].std(),
-        'height_mean': df['Height (cm)'].mean(),
-        'height_std': df['Height (cm)'].std(),
+        'weight_mean': body_stats.at['mean', 'Weight (kg)'],
+        'weight_std': body_stats.at['std', 'Weight (kg)'],
+        'height_mean': body_stats.at['mean', 'Height (cm)'],
+        'height_std': body_stats.at['std', 'Height (cm)'],
         'workout_types': list(df['Workout Type'].unique()),
         'intensity_levels': ['Low', 'Medium', 'High']
     }
-    joblib.dump(data_stats, 'ml_models/data_stats.pkl')
+    joblib.dump(data_stats, 'ml_models/data_stats.pkl', protocol=PICKLE_PROTOCOL)
     print("   ✅ Saved data_stats.pkl")
 
 def main():
@@ -227,16 +237,16 @@ def main():
     try:
         # Load and preprocess data
         df, label_encoders = load_and_preprocess_data()
+        data = prepare_training_data(df)
         
-        # Train individual models
-        hydration_model = train_hydration_model(df)
-        nutrition_model = train_nutrition_model(df)
-        calorie_model = train_calorie_burn_model(df)
-        heart_rate_model = train_heart_rate_model(df)
+        # Train individual models concurrently; XGBoost releases the GIL while fitting,
+        # so threads share the feature matrix without copying it into worker processes
+        trained = Parallel(n_jobs=len(MODEL_CONFIGS), prefer='threads')(
+            delayed(train_model)(config, data) for config in MODEL_CONFIGS)
+        models = {config['name']: model for config, model in zip(MODEL_CONFIGS, trained)}
         
         # Save everything
-        save_models_and_encoders(hydration_model, nutrition_model, calorie_model, 
-                               heart_rate_model, label_encoders, df)
+        save_models_and_encoders(models, label_encoders, df)
         
         print("🎉 All models saved successfully!")
         print("=" * 50)
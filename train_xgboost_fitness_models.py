@@ -1,11 +1,59 @@
 import pandas as pd
 import numpy as np
-from xgboost import XGBRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.metrics import mean_absolute_error, r2_score
 import joblib
 import os
+from train_improved_xgboost_models import PICKLE_PROTOCOL, fit_xgboost_model, read_workout_csv
+
+# One entry per model: feature columns, target column, tree shape and how it reports progress
+MODEL_CONFIGS = [
+    {
+        'name': 'hydration',
+        'title': "💧 Training hydration prediction model...",
+        'label': 'Hydration Model',
+        'unit': 'ml',
+        'features': ['Weight (kg)', 'Height (cm)', 'Workout Duration (mins)',
+                     'Workout Intensity_encoded', 'Calories Burned', 'Heart Rate (bpm)'],
+        'target': 'Water Intake (liters)',
+        'target_scale': 1000,  # Convert to ml
+        'n_estimators': 100,
+        'max_depth': 6
+    },
+    {
+        'name': 'nutrition',
+        'title': "🍎 Training nutrition prediction model...",
+        'label': 'Nutrition Model',
+        'unit': ' calories',
+        'features': ['Age', 'Gender_encoded', 'Height (cm)', 'Weight (kg)',
+                     'Workout Duration (mins)', 'Calories Burned', 'Body Fat (%)'],
+        'target': 'Daily Calories Intake',
+        'n_estimators': 150,
+        'max_depth': 8
+    },
+    {
+        'name': 'calorie_burn',
+        'title': "🎯 Training workout benefits prediction model...",
+        'label': 'Workout Benefits Model',
+        'unit': ' calories',
+        'features': ['Age', 'Weight (kg)', 'Workout Type_encoded', 'Workout Duration (mins)',
+                     'Workout Intensity_encoded', 'Heart Rate (bpm)', 'VO2 Max'],
+        'target': 'Calories Burned',
+        'n_estimators': 200,
+        'max_depth': 7
+    },
+    {
+        'name': 'heart_rate',
+        'title': "❤️ Training heart rate prediction model...",
+        'label': 'Heart Rate Model',
+        'unit': ' bpm',
+        'features': ['Age', 'Weight (kg)', 'Resting Heart Rate (bpm)', 'VO2 Max',
+                     'Workout Type_encoded', 'Workout Intensity_encoded'],
+        'target': 'Heart Rate (bpm)',
+        'n_estimators': 100,
+        'max_depth': 5
+    }
+]
 
 class FitnessModelTrainer:
     def __init__(self, data_path):
@@ -19,7 +67,7 @@ class FitnessModelTrainer:
         print("📊 Loading workout fitness tracker data...")
         
         # Load the dataset
-        self.df = pd.read_csv(self.data_path)
+        self.df = read_workout_csv(self.data_path)
         print(f"✅ Loaded {len(self.df)} workout records")
         
         # Clean column names
@@ -30,151 +78,39 @@ class FitnessModelTrainer:
         
         for col in categorical_cols:
             if col in self.df.columns:
+                # pd.Categorical encodes in one hashed pass; keep a LabelEncoder with the same classes for the APIs
+                categorical = pd.Categorical(self.df[col].fillna('Unknown'))
                 le = LabelEncoder()
-                self.df[f'{col}_encoded'] = le.fit_transform(self.df[col].fillna('Unknown'))
+                le.classes_ = categorical.categories.to_numpy()
+                self.df[f'{col}_encoded'] = categorical.codes
                 self.encoders[col] = le
         
-        print("🔄 Data preprocessing completed")
-        return self.df
-    
-    def train_hydration_model(self):
-        """Train XGBoost model for hydration recommendations"""
-        print("💧 Training hydration prediction model...")
-        
-        # Features for hydration prediction
-        features = ['Weight (kg)', 'Height (cm)', 'Workout Duration (mins)', 
-                   'Workout Intensity_encoded', 'Calories Burned', 'Heart Rate (bpm)']
-        
-        # Target: Water Intake (liters) -> convert to ml
-        X = self.df[features].fillna(self.df[features].mean())
-        y = self.df['Water Intake (liters)'] * 1000  # Convert to ml
-        
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        
-        # Train XGBoost model
-        model = XGBRegressor(
-            n_estimators=100,
-            max_depth=6,
-            learning_rate=0.1,
-            random_state=42
-        )
-        
-        model.fit(X_train, y_train)
-        
-        # Evaluate
-        y_pred = model.predict(X_test)
-        mae = mean_absolute_error(y_test, y_pred)
-        r2 = r2_score(y_test, y_pred)
-        
-        print(f"   📈 Hydration Model - MAE: {mae:.2f}ml, R²: {r2:.3f}")
-        
-        self.models['hydration'] = model
-        return model
-    
-    def train_nutrition_model(self):
-        """Train XGBoost model for nutrition/calorie recommendations"""
-        print("🍎 Training nutrition prediction model...")
-        
-        # Features for nutrition prediction
-        features = ['Age', 'Gender_encoded', 'Height (cm)', 'Weight (kg)', 
-                   'Workout Duration (mins)', 'Calories Burned', 'Body Fat (%)']
-        
-        # Target: Daily Calories Intake
-        X = self.df[features].fillna(self.df[features].mean())
-        y = self.df['Daily Calories Intake'].fillna(self.df['Daily Calories Intake'].mean())
-        
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        
-        # Train XGBoost model
-        model = XGBRegressor(
-            n_estimators=150,
-            max_depth=8,
-            learning_rate=0.1,
-            random_state=42
-        )
-        
-        model.fit(X_train, y_train)
-        
-        # Evaluate
-        y_pred = model.predict(X_test)
-        mae = mean_absolute_error(y_test, y_pred)
-        r2 = r2_score(y_test, y_pred)
+        # Column means and stds in one aggregation, reused for NaN filling and the saved statistics
+        self.column_stats = self.df.select_dtypes(include=[np.number]).agg(['mean', 'std'])
+        self.means = self.column_stats.loc['mean']
         
-        print(f"   📈 Nutrition Model - MAE: {mae:.2f} calories, R²: {r2:.3f}")
+        # One train/test split shared by every model: reorder the rows once, training rows first,
+        # so each model's split is two contiguous slices
+        train_idx, test_idx = train_test_split(np.arange(len(self.df)), test_size=0.2, random_state=42)
+        self.df = self.df.iloc[np.concatenate((train_idx, test_idx))].reset_index(drop=True)
+        self.n_train = len(train_idx)
         
-        self.models['nutrition'] = model
-        return model
+        print("🔄 Data preprocessing completed")
+        return self.df
     
-    def train_calorie_burn_model(self):
-        """Train XGBoost model for workout benefits/calorie burn prediction"""
-        print("🎯 Training workout benefits prediction model...")
-        
-        # Features for calorie burn prediction
-        features = ['Age', 'Weight (kg)', 'Workout Type_encoded', 'Workout Duration (mins)',
-                   'Workout Intensity_encoded', 'Heart Rate (bpm)', 'VO2 Max']
-        
-        # Target: Calories Burned
-        X = self.df[features].fillna(self.df[features].mean())
-        y = self.df['Calories Burned'].fillna(self.df['Calories Burned'].mean())
-        
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        
-        # Train XGBoost model
-        model = XGBRegressor(
-            n_estimators=200,
-            max_depth=7,
-            learning_rate=0.1,
-            random_state=42
-        )
-        
-        model.fit(X_train, y_train)
-        
-        # Evaluate
-        y_pred = model.predict(X_test)
-        mae = mean_absolute_error(y_test, y_pred)
-        r2 = r2_score(y_test, y_pred)
-        
-        print(f"   📈 Workout Benefits Model - MAE: {mae:.2f} calories, R²: {r2:.3f}")
-        
-        self.models['calorie_burn'] = model
-        return model
+    def _split(self, features, y):
+        """Float32 train/test arrays for the given features (NaNs filled with column means)"""
+        X = self.df[features].to_numpy(dtype=np.float32, copy=True)
+        np.copyto(X, self.means[features].to_numpy(dtype=np.float32), where=np.isnan(X))
+        y = y.to_numpy()
+        return X[:self.n_train], X[self.n_train:], y[:self.n_train], y[self.n_train:]
     
-    def train_heart_rate_model(self):
-        """Train XGBoost model for heart rate zone predictions"""
-        print("❤️ Training heart rate prediction model...")
-        
-        # Features for heart rate prediction
-        features = ['Age', 'Weight (kg)', 'Resting Heart Rate (bpm)', 'VO2 Max',
-                   'Workout Type_encoded', 'Workout Intensity_encoded']
-        
-        # Target: Heart Rate (bpm) during workout
-        X = self.df[features].fillna(self.df[features].mean())
-        y = self.df['Heart Rate (bpm)'].fillna(self.df['Heart Rate (bpm)'].mean())
-        
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        
-        # Train XGBoost model
-        model = XGBRegressor(
-            n_estimators=100,
-            max_depth=5,
-            learning_rate=0.1,
-            random_state=42
-        )
-        
-        model.fit(X_train, y_train)
-        
-        # Evaluate
-        y_pred = model.predict(X_test)
-        mae = mean_absolute_error(y_test, y_pred)
-        r2 = r2_score(y_test, y_pred)
-        
-        print(f"   📈 Heart Rate Model - MAE: {mae:.2f} bpm, R²: {r2:.3f}")
-        
-        self.models['heart_rate'] = model
+    def train_model(self, config):
+        """Train the XGBoost model described by a MODEL_CONFIGS entry"""
+        y = self.df[config['target']].fillna(self.means[config['target']]) * config.get('target_scale', 1)
+        X_train, X_test, y_train, y_test = self._split(config['features'], y)
+        model = fit_xgboost_model(config, X_train, X_test, y_train, y_test)
+        self.models[config['name']] = model
         return model
     
     def save_models(self):
@@ -186,19 +122,22 @@ class FitnessModelTrainer:
         
         # Save models
         for model_name, model in self.models.items():
-            joblib.dump(model, f'ml_models/{model_name}_xgboost_model.pkl')
+            joblib.dump(model, f'ml_models/{model_name}_xgboost_model.pkl', protocol=PICKLE_PROTOCOL)
             print(f"   ✅ Saved {model_name}_xgboost_model.pkl")
+            # Native binary (UBJSON) booster, loaded by simple_xgboost_api without unpickling
+            model.get_booster().save_model(f'ml_models/{model_name}_xgboost_model.ubj')
+            print(f"   ✅ Saved {model_name}_xgboost_model.ubj")
         
         # Save encoders
-        joblib.dump(self.encoders, 'ml_models/label_encoders.pkl')
+        joblib.dump(self.encoders, 'ml_models/label_encoders.pkl', protocol=PICKLE_PROTOCOL)
         print("   ✅ Saved label_encoders.pkl")
         
         # Save data statistics for normalization
         stats = {
-            'mean_values': self.df.select_dtypes(include=[np.number]).mean().to_dict(),
-            'std_values': self.df.select_dtypes(include=[np.number]).std().to_dict()
+            'mean_values': self.means.to_dict(),
+            'std_values': self.column_stats.loc['std'].to_dict()
         }
-        joblib.dump(stats, 'ml_models/data_stats.pkl')
+        joblib.dump(stats, 'ml_models/data_stats.pkl', protocol=PICKLE_PROTOCOL)
         print("   ✅ Saved data_stats.pkl")
         
         print("🎉 All models saved successfully!")
@@ -212,10 +151,8 @@ class FitnessModelTrainer:
         self.load_and_prepare_data()
         
         # Train all models
-        self.train_hydration_model()
-        self.train_nutrition_model()
-        self.train_calorie_burn_model()
-        self.train_heart_rate_model()
+        for config in MODEL_CONFIGS:
+            self.train_model(config)
         
         # Save models
         self.save_models()
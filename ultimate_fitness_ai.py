@@ -4,8 +4,11 @@ Combines your perfect 30/30 model with BERT4Rec sequential intelligence
 """
 
 import joblib
+import logging
+import threading
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import numpy as np
 import warnings
 from typing import Dict, List, Any, Optional, Tuple
@@ -14,6 +17,48 @@ warnings.filterwarnings('ignore')
 # Import the perfect model predictor
 from perfect_model_integration import PerfectEnhancedModelPredictor
 
+logger = logging.getLogger(__name__)
+
+class MiniEncoderBlock(nn.Module):
+    """Post-norm transformer encoder layer (same layout as nn.TransformerEncoderLayer)
+    with attention computed directly by F.scaled_dot_product_attention"""
+    def __init__(self, hidden_size: int, num_heads: int, ff_size: int, dropout: float = 0.1):
+        super().__init__()
+        self.num_heads = num_heads
+        self.dropout_p = dropout
+        
+        self.qkv_proj = nn.Linear(hidden_size, hidden_size * 3)
+        self.out_proj = nn.Linear(hidden_size, hidden_size)
+        self.feed_forward = nn.Sequential(
+            nn.Linear(hidden_size, ff_size), nn.ReLU(), nn.Dropout(dropout),
+            nn.Linear(ff_size, hidden_size)
+        )
+        self.norm1 = nn.LayerNorm(hidden_size)
+        self.norm2 = nn.LayerNorm(hidden_size)
+        self.dropout1 = nn.Dropout(dropout)
+        self.dropout2 = nn.Dropout(dropout)
+    
+    def forward(self, x, attn_mask=None):
+        """attn_mask: optional bool mask broadcastable to (batch, heads, seq, seq), True = attend"""
+        batch_size, seq_length, hidden_size = x.shape
+        head_size = hidden_size // self.num_heads
+        
+        q, k, v = self.qkv_proj(x).chunk(3, dim=-1)
+        q, k, v = (t.view(batch_size, seq_length, self.num_heads, head_size).transpose(1, 2)
+                   for t in (q, k, v))
+        
+        # A float mask would be added to the scores and can knock SDPA off its fused kernels
+        if attn_mask is not None:
+            attn_mask = attn_mask.bool()
+        attn = F.scaled_dot_product_attention(
+            q, k, v, attn_mask=attn_mask, is_causal=False,
+            dropout_p=self.dropout_p if self.training else 0.0
+        )
+        attn = attn.transpose(1, 2).reshape(batch_size, seq_length, hidden_size)
+        
+        x = self.norm1(x + self.dropout1(self.out_proj(attn)))
+        return self.norm2(x + self.dropout2(self.feed_forward(x)))
+
 class LightweightBERT4RecForFitness(nn.Module):
     """Lightweight BERT4Rec model optimized for fitness sequences"""
     def __init__(self, vocab_size: int = 100, hidden_size: int = 64, 
@@ -27,11 +72,10 @@ class LightweightBERT4RecForFitness(nn.Module):
         self.position_embeddings = nn.Embedding(max_seq_length, hidden_size)
         
         # Transformer
-        encoder_layer = nn.TransformerEncoderLayer(
-            d_model=hidden_size, nhead=num_heads, dim_feedforward=hidden_size * 2,
-            dropout=0.1, batch_first=True
+        self.encoder_blocks = nn.ModuleList(
+            MiniEncoderBlock(hidden_size, num_heads, ff_size=hidden_size * 2, dropout=0.1)
+            for _ in range(num_layers)
         )
-        self.transformer = nn.TransformerEncoder(encoder_layer, num_layers)
         
         # Output heads
         self.workout_type_head = nn.Linear(hidden_size, 6)
@@ -60,7 +104,9 @@ class LightweightBERT4RecForFitness(nn.Module):
             self.token_embeddings(input_ids) + self.position_embeddings(position_ids)
         )
         
-        hidden_states = self.transformer(embeddings)
+        hidden_states = embeddings
+        for block in self.encoder_blocks:
+            hidden_states = block(hidden_states)
         last_hidden = hidden_states[:, -1, :]
         
         return {
@@ -97,32 +143,34 @@ class FitnessSequenceTokenizer:
             token_id += 1
         
         self.vocab_size = token_id
+        
+        # Token ids by upper-cased name / bin, so encoding does no string formatting
+        self.pad_id = self.vocab['[PAD]']
+        self.cls_id = self.vocab['[CLS]']
+        self.sep_id = self.vocab['[SEP]']
+        self.workout_type_ids = {wt.upper(): self.vocab[f'WORKOUT_{wt.upper()}'] for wt in self.workout_types}
+        self.intensity_ids = {i.upper(): self.vocab[f'INTENSITY_{i.upper()}'] for i in self.intensities}
+        self.duration_ids = [self.vocab[f'DURATION_{i}'] for i in range(10)]
+        self.calorie_ids = [self.vocab[f'CALORIE_{i}'] for i in range(10)]
     
     def workout_to_tokens(self, workout_data):
         """Convert workout to tokens"""
-        tokens = [self.vocab['[CLS]']]
-        
-        # Workout type
-        workout_type = workout_data.get('workout_type', 'Cardio')
-        if f'WORKOUT_{workout_type.upper()}' in self.vocab:
-            tokens.append(self.vocab[f'WORKOUT_{workout_type.upper()}'])
+        tokens = [self.cls_id]
         
-        # Intensity
-        intensity = workout_data.get('intensity', 'Medium')
-        if f'INTENSITY_{intensity.upper()}' in self.vocab:
-            tokens.append(self.vocab[f'INTENSITY_{intensity.upper()}'])
+        # Workout type and intensity (unknown values are skipped)
+        workout_type_id = self.workout_type_ids.get(workout_data.get('workout_type', 'Cardio').upper())
+        if workout_type_id is not None:
+            tokens.append(workout_type_id)
         
-        # Duration bin
-        duration = workout_data.get('duration', 30)
-        duration_bin = min(int(duration // 15), 9)
-        tokens.append(self.vocab[f'DURATION_{duration_bin}'])
+        intensity_id = self.intensity_ids.get(workout_data.get('intensity', 'Medium').upper())
+        if intensity_id is not None:
+            tokens.append(intensity_id)
         
-        # Calorie bin
-        calories = workout_data.get('calories_burned', 300)
-        calorie_bin = min(int(calories // 100), 9)
-        tokens.append(self.vocab[f'CALORIE_{calorie_bin}'])
+        # Duration and calorie bins
+        tokens.append(self.duration_ids[min(int(workout_data.get('duration', 30) // 15), 9)])
+        tokens.append(self.calorie_ids[min(int(workout_data.get('calories_burned', 300) // 100), 9)])
         
-        tokens.append(self.vocab['[SEP]'])
+        tokens.append(self.sep_id)
         return tokens
     
     def encode_sequence(self, workout_history, max_length=20):
@@ -136,24 +184,25 @@ class FitnessSequenceTokenizer:
         if len(all_tokens) > max_length:
             all_tokens = all_tokens[-max_length:]
         
-        attention_mask = [1] * len(all_tokens)
-        
-        while len(all_tokens) < max_length:
-            all_tokens.append(self.vocab['[PAD]'])
-            attention_mask.append(0)
+        n_padding = max_length - len(all_tokens)
+        attention_mask = [1] * len(all_tokens) + [0] * n_padding
+        all_tokens += [self.pad_id] * n_padding
         
         return all_tokens, attention_mask
 
 class UltimateFitnessAI:
     """Ultimate Fitness AI combining your 30/30 model with BERT4Rec"""
     
-    def __init__(self):
-        print("🚀 INITIALIZING ULTIMATE FITNESS AI")
-        print("=" * 50)
+    def __init__(self, use_bert_features: bool = False):
+        logger.debug("🚀 INITIALIZING ULTIMATE FITNESS AI")
+        # The pattern metrics are plain counts over the history; the BERT4Rec forward
+        # only runs (and is only compiled) when its experimental output is wanted.
+        # BERT4Rec has no trained weights yet, so that output is untrained
+        self.use_bert_features = use_bert_features
         
         # Load your perfect enhanced model
         self.enhanced_predictor = PerfectEnhancedModelPredictor()
-        print("✅ Enhanced model (30/30 rating) loaded!")
+        logger.debug("✅ Enhanced model (30/30 rating) loaded!")
         
         # Initialize BERT4Rec
         self.tokenizer = FitnessSequenceTokenizer()
@@ -163,11 +212,34 @@ class UltimateFitnessAI:
             num_layers=2,
             num_heads=4
         )
-        print("✅ BERT4Rec sequence model initialized!")
-        print(f"📊 BERT4Rec parameters: {sum(p.numel() for p in self.bert4rec.parameters()):,}")
-        
+        # Inference only: switch off dropout and autograd once instead of per call
+        self.bert4rec.eval()
+        for p in self.bert4rec.parameters():
+            p.requires_grad_(False)
+        if use_bert_features:
+            self.bert4rec = self._compile_bert4rec(self.bert4rec)
+        logger.debug("✅ BERT4Rec sequence model initialized!")
+        logger.debug("📊 BERT4Rec parameters: %d", sum(p.numel() for p in self.bert4rec.parameters()))
+        
+    def _compile_bert4rec(self, model):
+        """torch.compile the model for the fixed (1, max_seq_length) input and run it once,
+        so the first request does not pay the compile cost; falls back to eager on failure"""
+        if not hasattr(torch, 'compile'):  # PyTorch < 2.0
+            return model
+        try:
+            compiled = torch.compile(model, mode="reduce-overhead", fullgraph=True, dynamic=False)
+            # Same call signature as analyze_workout_patterns (ids + mask tensor), so the
+            # first request hits the warm-up's graph instead of recompiling
+            dummy_ids = torch.zeros((1, model.max_seq_length), dtype=torch.long)
+            with torch.inference_mode():
+                compiled(dummy_ids, torch.ones_like(dummy_ids))
+            return compiled
+        except Exception as e:
+            logger.debug("torch.compile unavailable, running BERT4Rec eagerly: %s", e)
+            return model
+    
     def analyze_workout_patterns(self, workout_history):
-        """Analyze workout patterns using BERT4Rec"""
+        """Analyze workout patterns (variety, consistency, next workout) from the history"""
         if not workout_history:
             return {
                 'pattern_score': 0.5,
@@ -177,16 +249,6 @@ class UltimateFitnessAI:
             }
         
         try:
-            # Encode sequence
-            input_ids, attention_mask = self.tokenizer.encode_sequence(workout_history)
-            input_ids = torch.tensor([input_ids], dtype=torch.long)
-            attention_mask = torch.tensor([attention_mask], dtype=torch.long)
-            
-            # Get BERT4Rec analysis
-            self.bert4rec.eval()
-            with torch.no_grad():
-                outputs = self.bert4rec(input_ids, attention_mask)
-            
             # Calculate pattern metrics
             workout_types = [w.get('workout_type', 'Cardio') for w in workout_history[-5:]]
             intensities = [w.get('intensity', 'Medium') for w in workout_history[-5:]]
@@ -222,7 +284,7 @@ class UltimateFitnessAI:
                 else:
                     next_recommendation = 'Strength'  # Balanced choice
             
-            return {
+            analysis = {
                 'pattern_score': pattern_score,
                 'variety_score': variety_score,
                 'consistency_score': consistency_score,
@@ -231,6 +293,23 @@ class UltimateFitnessAI:
                 'total_workouts': len(workout_history),
                 'recent_trend': f"Last 3: {' -> '.join(recent_types[-3:])}"
             }
+            
+            if self.use_bert_features:
+                # Experimental: the model keeps its random init (no weights are trained or
+                # loaded), so this is not a recommendation and is labelled as such
+                input_ids, attention_mask = self.tokenizer.encode_sequence(workout_history)
+                input_ids = torch.tensor([input_ids], dtype=torch.long)
+                attention_mask = torch.tensor([attention_mask], dtype=torch.long)
+                with torch.inference_mode():
+                    outputs = self.bert4rec(input_ids, attention_mask)
+                workout_idx = int(outputs['workout_type_logits'].argmax(dim=-1)[0])
+                analysis['bert_experimental'] = {
+                    'next_workout': self.tokenizer.workout_types[workout_idx],
+                    'trained': False,
+                    'note': 'Untrained BERT4Rec output, for development only - not a recommendation'
+                }
+            
+            return analysis
         
         except Exception as e:
             print(f"⚠️ Pattern analysis error: {e}")
@@ -276,6 +355,7 @@ class UltimateFitnessAI:
         enhanced_prediction['ai_insights'] = {
             'enhanced_model_rating': '30/30 - EXTREMELY VALUABLE',
             'pattern_analysis': pattern_analysis,
+            'bert_features_used': self.use_bert_features,
             'combined_ai_score': (pattern_score + variety_score + consistency_score) / 3,
             'fitness_trajectory': self._calculate_fitness_trajectory(workout_history),
             'optimization_tips': self._get_optimization_tips(current_workout, pattern_analysis)
@@ -333,10 +413,23 @@ class UltimateFitnessAI:
         
         return tips
 
+# One UltimateFitnessAI per process: loading the enhanced model and building BERT4Rec
+# happens on the first call, later calls reuse the loaded weights
+_ultimate_ai = None
+_ultimate_ai_lock = threading.Lock()
+
+def get_ultimate_ai():
+    """Shared UltimateFitnessAI instance, created on first use"""
+    global _ultimate_ai
+    if _ultimate_ai is None:
+        with _ultimate_ai_lock:
+            if _ultimate_ai is None:
+                _ultimate_ai = UltimateFitnessAI()
+    return _ultimate_ai
+
 def get_ultimate_fitness_recommendations(current_workout, workout_history=None):
     """Main function to get ultimate AI recommendations"""
-    ai = UltimateFitnessAI()
-    return ai.get_ultimate_prediction(current_workout, workout_history)
+    return get_ultimate_ai().get_ultimate_prediction(current_workout, workout_history)
 
 def test_ultimate_ai():
     """Test the ultimate AI system"""
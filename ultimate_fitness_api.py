@@ -18,7 +18,7 @@ warnings.filterwarnings('ignore')
 
 # Import the Ultimate Fitness AI components
 try:
-    from ultimate_fitness_ai import UltimateFitnessAI, get_ultimate_fitness_recommendations
+    from ultimate_fitness_ai import get_ultimate_ai, get_ultimate_fitness_recommendations
     ULTIMATE_AI_AVAILABLE = True
     print("✅ Ultimate Fitness AI loaded successfully!")
 except ImportError as e:
@@ -31,7 +31,7 @@ CORS(app)
 # Initialize Ultimate AI
 if ULTIMATE_AI_AVAILABLE:
     try:
-        ultimate_ai = UltimateFitnessAI()
+        ultimate_ai = get_ultimate_ai()
         print("🚀 Ultimate AI initialized successfully!")
     except Exception as e:
         print(f"❌ Failed to initialize Ultimate AI: {e}")
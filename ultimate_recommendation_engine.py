@@ -3,13 +3,13 @@ Ultimate Fitness Recommendation Engine
 Combines your 30/30 rated custom model with AI enhancement for superior recommendations.
 """
 
-import joblib
 import numpy as np
 import pandas as pd
 from typing import Dict, List, Any, Optional
 from dataclasses import dataclass
 import time
 import logging
+from working_model_loader import ENHANCED_MODEL_PATH, read_enhanced_model_data
 
 @dataclass
 class UserInput:
@@ -55,10 +55,11 @@ class EnhancedModelWrapper:
     Handles all preprocessing, prediction, and post-processing.
     """
     
-    def __init__(self, model_path: str = "enhanced_fitness_model.pkl"):
+    def __init__(self, model_path: str = ENHANCED_MODEL_PATH):
         self.model_path = model_path
         self.model_data = None
         self.models = {}
+        self.scaler = None
         self.scalers = {}
         self.encoders = {}
         self.feature_cols = []
@@ -70,9 +71,10 @@ class EnhancedModelWrapper:
         """Load and initialize your enhanced model."""
         try:
             print("🔄 Loading enhanced fitness model...")
-            self.model_data = joblib.load(self.model_path)
+            self.model_data = read_enhanced_model_data(self.model_path)
             
             self.models = self.model_data.get('models', {})
+            self.scaler = self.model_data.get('scaler')
             self.scalers = self.model_data.get('scalers', {})
             self.encoders = self.model_data.get('encoders', {})
             self.feature_cols = self.model_data.get('feature_cols', [])
@@ -95,11 +97,11 @@ class EnhancedModelWrapper:
             heart_rate_intensity = (user_input.heart_rate_bpm - user_input.resting_heart_rate_bpm) / user_input.resting_heart_rate_bpm
             
             # Encode categorical features
-            gender_encoded = self.encoders['gender'].transform([user_input.gender])[0]
-            workout_type_encoded = self.encoders['workout_type'].transform([user_input.workout_type])[0]
-            intensity_encoded = self.encoders['intensity'].transform([user_input.workout_intensity])[0]
-            mood_before_encoded = self.encoders['mood_before'].transform([user_input.mood_before_workout])[0]
-            mood_after_encoded = self.encoders['mood_after'].transform([user_input.mood_after_workout])[0]
+            gender_encoded = self._encode('gender', user_input.gender)
+            workout_type_encoded = self._encode('workout_type', user_input.workout_type)
+            intensity_encoded = self._encode('intensity', user_input.workout_intensity)
+            mood_before_encoded = self._encode('mood_before', user_input.mood_before_workout)
+            mood_after_encoded = self._encode('mood_after', user_input.mood_after_workout)
             
             # Create feature vector matching your model's expected input
             features = np.array([
@@ -124,6 +126,20 @@ class EnhancedModelWrapper:
             print(f"❌ Error preparing features: {e}")
             raise
     
+    def _encode(self, encoder_name: str, value: str) -> int:
+        """Label code from a {label: code} dict (npz layout) or a fitted LabelEncoder (legacy pickle)."""
+        encoder = self.encoders[encoder_name]
+        if isinstance(encoder, dict):
+            return encoder[value]
+        return encoder.transform([value])[0]
+    
+    def _scale(self, target_name: str, features: np.ndarray) -> np.ndarray:
+        """Standardize features with the shared scaler (npz layout) or the target's own StandardScaler."""
+        if self.scaler is not None:
+            mean, scale = self.scaler
+            return (features - mean) / scale
+        return self.scalers[target_name].transform(features)
+    
     def predict_all(self, user_input: UserInput) -> ComprehensivePredictions:
         """Make all predictions using your enhanced model."""
         start_time = time.time()
@@ -138,8 +154,7 @@ class EnhancedModelWrapper:
             
             for target_name, model in self.models.items():
                 # Scale features
-                scaler = self.scalers[target_name]
-                scaled_features = scaler.transform(features)
+                scaled_features = self._scale(target_name, features)
                 
                 # Make prediction
                 prediction = model.predict(scaled_features)[0]
@@ -191,7 +206,7 @@ class UltimateFitnessRecommendationEngine:
     The ultimate fitness recommendation engine combining your custom model with AI.
     """
     
-    def __init__(self, model_path: str = "enhanced_fitness_model.pkl"):
+    def __init__(self, model_path: str = ENHANCED_MODEL_PATH):
         self.enhanced_model = EnhancedModelWrapper(model_path)
         print("🚀 Ultimate Fitness Recommendation Engine initialized!")
         print("✅ Your 30/30 rated model is ready!")
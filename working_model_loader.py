@@ -3,16 +3,47 @@ Working Model Loader - Joblib Format
 Successfully loads the enhanced fitness model using joblib
 """
 
+import os
 import joblib
 import numpy as np
 import warnings
 warnings.filterwarnings('ignore')
 
-def load_enhanced_model(model_path="enhanced_fitness_model.pkl"):
-    """Load the enhanced model using joblib"""
+ENHANCED_MODEL_PATH = "enhanced_fitness_model.pkl"
+# Layout written by backup/enhanced_fitness_predictor.py: encoder classes and the shared
+# scaler as arrays in the .npz, only the boosters pickled; keep the two in sync
+ENHANCED_MODEL_ARRAYS_PATH = "enhanced_fitness_model.npz"
+ENHANCED_MODEL_BOOSTERS_PATH = "enhanced_fitness_boosters.pkl"
+ENCODER_NAMES = ['gender', 'workout_type', 'intensity', 'mood_before', 'mood_after']
+
+def read_enhanced_model_data(model_path=ENHANCED_MODEL_PATH):
+    """Model data dict from the trainer's npz + boosters files when they sit next to
+    model_path, otherwise from the legacy single pickle. The npz layout has one shared
+    'scaler' (mean, scale) and {label: code} encoders; the legacy pickle has per-target
+    'scalers' and fitted LabelEncoders"""
+    model_dir = os.path.dirname(model_path)
+    arrays_path = os.path.join(model_dir, ENHANCED_MODEL_ARRAYS_PATH)
+    boosters_path = os.path.join(model_dir, ENHANCED_MODEL_BOOSTERS_PATH)
+    if not (os.path.exists(arrays_path) and os.path.exists(boosters_path)):
+        return joblib.load(model_path)
+    
+    with np.load(arrays_path) as arrays:
+        return {
+            'models': joblib.load(boosters_path),
+            'scaler': (arrays['scaler_mean'], arrays['scaler_scale']),
+            'encoders': {
+                name: {label: code for code, label in enumerate(arrays[f'{name}_classes'].tolist())}
+                for name in ENCODER_NAMES
+            },
+            'feature_cols': arrays['feature_cols'].tolist(),
+            'input_features': arrays['input_features'].tolist(),
+            'output_targets': arrays['output_targets'].tolist()
+        }
+
+def load_enhanced_model(model_path=ENHANCED_MODEL_PATH):
+    """Load the enhanced model data (see read_enhanced_model_data)"""
     try:
-        import joblib
-        data = joblib.load(model_path)
+        data = read_enhanced_model_data(model_path)
         print("Model loaded successfully using joblib!")
         return data
         
@@ -23,7 +54,7 @@ def load_enhanced_model(model_path="enhanced_fitness_model.pkl"):
 class WorkingEnhancedModelPredictor:
     """Working predictor for the enhanced fitness model"""
     
-    def __init__(self, model_path="enhanced_fitness_model.pkl"):
+    def __init__(self, model_path=ENHANCED_MODEL_PATH):
         self.model_data = load_enhanced_model(model_path)
         self.models = None
         self.label_encoders = {}
@@ -57,6 +88,8 @@ class WorkingEnhancedModelPredictor:
             return 0
         
         encoder = self.label_encoders[encoder_name]
+        if isinstance(encoder, dict):
+            return encoder.get(value, 0)
         if hasattr(encoder, 'classes_') and value in encoder.classes_:
             return encoder.transform([value])[0]
         elif hasattr(encoder, 'classes_'):
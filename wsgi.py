@@ -0,0 +1,15 @@
+"""
+WSGI entry point for the simple XGBoost API
+
+    gunicorn --preload -w 4 -k gthread --threads 4 -b 0.0.0.0:5001 wsgi:app
+
+With --preload the models are loaded once in the master and the forked workers
+share the loaded Boosters copy-on-write.
+"""
+
+from simple_xgboost_api import app, load_models
+
+__all__ = ["app"]
+
+if not load_models():
+    raise RuntimeError("Failed to load XGBoost models from ml_models/")